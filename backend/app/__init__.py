@@ -13,6 +13,9 @@ login_manager.login_view = 'main.login'
 
 def create_app():
     app = Flask(__name__)
+
+    from .json_provider import JSONProvider
+    app.json = JSONProvider(app)
     
     CORS(app, supports_credentials=True, resources={
         r"/api/*": {
@@ -37,6 +40,16 @@ def create_app():
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
+    from .compression import init_compression
+    init_compression(app)
+
+    from .caching import init_response_cache
+    init_response_cache(app)
+
+    # Stored ward assignments follow the boundary files, including hot reloads.
+    from .assignments import init_boundary_sync
+    init_boundary_sync(app)
+
     from .routes import bp
     app.register_blueprint(bp)
     
@@ -0,0 +1,190 @@
+"""
+Keeps per-post values derived from boundary layers (such as Post.ward) in step
+with the boundary files.
+
+Whenever a process loads or hot-reloads a layer, it records the layer's version
+in boundary_version. The first worker to see a new version recomputes the
+stored assignments and bumps the data version, so ETags, tile, cluster and
+response caches keyed by it are invalidated everywhere. The other workers find
+the version already recorded and do nothing.
+
+enrich_posts is the batch counterpart for rows that lack these values (or
+Post.city) altogether, e.g. coordinate-only posts; see enrich_posts.py.
+"""
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .geo import WARD_LAYER, boundaries
+from .models import BoundaryVersion, Post, bump_data_version
+
+REASSIGN_CHUNK_SIZE = 5000
+
+# Boundary layer -> Post column holding the name of the area each post falls in.
+ASSIGNED_COLUMNS = {WARD_LAYER: 'ward', 'assembly_constituencies': 'constituency'}
+
+# Boundary layer -> the city all of its areas lie in; posts inside any area get it as Post.city.
+LAYER_CITIES = {WARD_LAYER: 'Hyderabad'}  # GHMC wards
+
+
+def _claim(session, layer):
+    """Records layer.version for the layer; False when it was already recorded."""
+    table = BoundaryVersion.__table__
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    result = session.execute(
+        update(table).where(table.c.name == layer.name, table.c.version != layer.version)
+                     .values(version=layer.version, updated_at=now)
+    )
+    if result.rowcount:
+        return True
+    if session.execute(select(table.c.name).where(table.c.name == layer.name)).first() is not None:
+        return False
+    session.execute(insert(table).values(name=layer.name, version=layer.version, updated_at=now))
+    return True
+
+
+def _area_names(layer, longitudes, latitudes):
+    return [layer.names[i] if i >= 0 else None for i in layer.locate(longitudes, latitudes).tolist()]
+
+
+def _update_statement(column, version):
+    post = Post.__table__
+    return (update(post).where(post.c.id == bindparam('post_id'))
+                        .values({column: bindparam('value'), 'change_seq': version}))
+
+
+def reassign(session, layer, column, version, chunk_size=REASSIGN_CHUNK_SIZE):
+    """
+    Recomputes `column` from the layer for every post with coordinates, in id order
+    and chunk by chunk. Rows whose value changes are stamped with `version` so that
+    /analytics/changes and the live feed pick them up. Returns the number changed.
+    """
+    post = Post.__table__
+    statement = _update_statement(column, version)
+    last_id, changed = 0, 0
+    while True:
+        rows = session.execute(
+            select(post.c.id, post.c.longitude, post.c.latitude, post.c[column])
+            .where(post.c.id > last_id, post.c.latitude.isnot(None), post.c.longitude.isnot(None))
+            .order_by(post.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return changed
+        ids, longitudes, latitudes, current = zip(*rows)
+        names = _area_names(layer, longitudes, latitudes)
+        updates = [
+            {'post_id': post_id, 'value': name}
+            for post_id, name, old in zip(ids, names, current) if name != old
+        ]
+        if updates:
+            session.execute(statement, updates)
+            changed += len(updates)
+        last_id = ids[-1]
+
+
+def enrichment_layers():
+    """name -> loaded layer for every layer enrich_posts derives values from whose file is present."""
+    wanted = set(ASSIGNED_COLUMNS) | set(LAYER_CITIES)
+    return {name: boundaries.get(name) for name in boundaries.available() if name in wanted}
+
+
+def derived_values(layers, longitudes, latitudes):
+    """
+    Post column -> derived value per coordinate (None where no area covers it) for
+    the columns the given layers provide. When several layers imply a city, the
+    first one listed in LAYER_CITIES that covers the point wins.
+    """
+    values = {}
+    for name, layer in layers.items():
+        names = _area_names(layer, longitudes, latitudes)
+        if name in ASSIGNED_COLUMNS:
+            values[ASSIGNED_COLUMNS[name]] = names
+    for name, city in LAYER_CITIES.items():
+        if name not in layers:
+            continue
+        inside = values.get(ASSIGNED_COLUMNS.get(name)) or _area_names(layers[name], longitudes, latitudes)
+        current = values.get('city', [None] * len(inside))
+        values['city'] = [old if old is not None else (city if area is not None else None)
+                          for old, area in zip(current, inside)]
+    return values
+
+
+def enrich_posts(session, layers, after_id=0, chunk_size=REASSIGN_CHUNK_SIZE, overwrite=False):
+    """
+    Derives city, ward and constituency (whichever the layers provide) from the
+    coordinates of posts with id > after_id, in id order, committing one chunk at a
+    time. Only missing values are filled unless `overwrite`, which also corrects
+    values that differ from the derived ones; nothing is ever cleared. Each chunk
+    that changes rows bumps the data version and stamps them with it.
+
+    Yields (last id, posts changed) after every committed chunk, so a caller can
+    record the id and resume from it after an interruption.
+    """
+    post = Post.__table__
+    columns = [ASSIGNED_COLUMNS[name] for name in layers if name in ASSIGNED_COLUMNS]
+    if any(name in layers for name in LAYER_CITIES):
+        columns.insert(0, 'city')
+    if not columns:
+        return
+    query = select(post.c.id, post.c.longitude, post.c.latitude, *(post.c[column] for column in columns))
+    query = query.where(post.c.latitude.isnot(None), post.c.longitude.isnot(None))
+    if not overwrite:
+        query = query.where(or_(*(post.c[column].is_(None) for column in columns)))
+    while True:
+        rows = session.execute(query.where(post.c.id > after_id).order_by(post.c.id).limit(chunk_size)).all()
+        if not rows:
+            return
+        ids, longitudes, latitudes, *current = zip(*rows)
+        derived = derived_values(layers, longitudes, latitudes)
+        updates = {
+            column: [
+                {'post_id': post_id, 'value': new}
+                for post_id, new, old in zip(ids, derived[column], old_values)
+                if new is not None and new != old and (overwrite or old is None)
+            ]
+            for column, old_values in zip(columns, current)
+        }
+        changed = {params['post_id'] for params in sum(updates.values(), [])}
+        if changed:
+            version = bump_data_version(session)
+            for column, params in updates.items():
+                if params:
+                    session.execute(_update_statement(column, version), params)
+        session.commit()
+        after_id = ids[-1]
+        yield after_id, len(changed)
+
+
+def sync_boundary_layer(layer):
+    """Brings stored assignments and the data version in step with a loaded layer (needs an app context)."""
+    session = db.session
+    try:
+        if not _claim(session, layer):
+            session.rollback()
+            return
+        version = bump_data_version(session)
+        column = ASSIGNED_COLUMNS.get(layer.name)
+        changed = reassign(session, layer, column, version) if column else 0
+        session.commit()
+        print(f"Boundary layer {layer.name!r} is now {layer.version}; {changed} posts reassigned")
+    except IntegrityError:
+        session.rollback()  # another worker recorded the same version first
+    except Exception as e:
+        session.rollback()
+        print(f"Error syncing boundary layer {layer.name!r}: {e}")
+
+
+def init_boundary_sync(app):
+    def sync_in_background(layer):
+        def run():
+            with app.app_context():
+                sync_boundary_layer(layer)
+                db.session.remove()
+        threading.Thread(target=run, name=f'boundary-sync-{layer.name}', daemon=True).start()
+
+    boundaries.on_load(sync_in_background)
+    # Before every request, not only in views that use a layer: responses answered
+    # from a cache or with a 304 never reach the view.
+    app.before_request(boundaries.check_for_updates)
@@ -0,0 +1,63 @@
+from .models import Post
+from .queries import (TIMESERIES_INTERVALS, emotion_timeseries, filter_posts, grid_stats, post_facets,
+                      post_page, post_summary, ward_stats)
+
+MAX_SUBQUERIES = 20
+MAX_PAGE_SIZE = 50000
+
+
+def _posts(params):
+    limit = min(int(params.get('limit', 1000)), MAX_PAGE_SIZE)
+    offset = int(params.get('offset', 0))
+    if limit < 1 or offset < 0:
+        raise ValueError('limit must be positive and offset non-negative')
+    return post_page(filter_posts(Post.query, params), limit, offset)
+
+
+def _timeseries(params):
+    interval = params.get('interval', 'day')
+    if interval not in TIMESERIES_INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(TIMESERIES_INTERVALS)}")
+    return emotion_timeseries(filter_posts(Post.query, params), interval, params.get('start'), params.get('end'))
+
+
+# Sub-query type -> handler taking that sub-query's params (the same names the
+# individual endpoints accept as query-string arguments).
+SUBQUERIES = {
+    'summary': lambda params: post_summary(filter_posts(Post.query, params)),
+    'posts': _posts,
+    'ward_stats': lambda params: ward_stats(filter_posts(Post.query, params)),
+    'facets': lambda params: post_facets(filter_posts(Post.query, params)),
+    'timeseries': _timeseries,
+    'grid': lambda params: grid_stats(filter_posts(Post.query, params), int(params.get('precision', 6))),
+}
+
+
+def _params(spec):
+    """A sub-query's params as {name: str}, like a query string; ValueError when they are not that shape."""
+    params = spec.get('params') or {}
+    if not isinstance(params, dict):
+        raise ValueError('params must be an object')
+    for key, value in params.items():
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f'param {key!r} must be a string or number')
+    return {key: str(value) for key, value in params.items()}
+
+
+def run_batch(queries):
+    """
+    Runs named sub-queries ({name: {'type': ..., 'params': {...}}}) and returns
+    {name: result}. A failing sub-query reports {'error': ...} without failing the rest.
+    """
+    results = {}
+    for name, spec in queries.items():
+        kind = spec.get('type') if isinstance(spec, dict) else None
+        handler = SUBQUERIES.get(kind)
+        if handler is None:
+            results[name] = {'error': f"unknown type {kind!r}; expected one of {', '.join(SUBQUERIES)}"}
+            continue
+        try:
+            results[name] = handler(_params(spec))
+        except (TypeError, ValueError) as e:
+            results[name] = {'error': str(e)}
+    return results
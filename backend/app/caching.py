@@ -0,0 +1,335 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, g, request, make_response
+from .geo import CACHE_DIR
+from .models import current_data_version
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows); requests are then only coalesced within a worker
+    fcntl = None
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping for cached bodies and other derived results."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+def app_cache(name, maxsize):
+    """An LRUCache shared by the current app's requests, created on first use."""
+    cache = current_app.extensions.get(name)
+    if cache is None:
+        cache = current_app.extensions.setdefault(name, LRUCache(maxsize))
+    return cache
+
+
+def data_version_etag(version):
+    # Negotiated endpoints (see encoders.negotiated) serve several representations of the same data,
+    # and layer-dependent ones (see routes.layer_dependent) also change with the boundary file.
+    etag = f"{request.endpoint}-{g.representation}" if g.get('representation') else request.endpoint
+    if g.get('layer_version'):
+        etag += f"-{g.layer_version}"
+    return f"{etag}-v{version}"
+
+
+def conditional(view):
+    """
+    Adds ETag / Last-Modified validators derived from the data version and answers
+    matching If-None-Match / If-Modified-Since requests with 304 before the view runs.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, updated_at = current_data_version()
+        g.data_version = version  # the version response caches key on, matching the ETag
+        etag = data_version_etag(version)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = bool(since and updated_at and updated_at.replace(microsecond=0) <= since)
+
+        if not_modified:
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        # Weak validators: the representation may be re-encoded (e.g. compressed) on the way out.
+        response.set_etag(etag, weak=True)
+        if updated_at is not None:
+            response.last_modified = updated_at
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+
+class SharedResponseStore:
+    """
+    Response bodies in an SQLite file that every worker on the host opens, so a
+    result computed by one worker is reused by the others. Entries are dropped
+    once their TTL passes or a newer data version has been stored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, data_version INTEGER NOT NULL, '
+                'expires_at REAL NOT NULL, mimetype TEXT NOT NULL, body BLOB NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT expires_at, mimetype, body FROM responses WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return (row[0], row[1], bytes(row[2])) if row else None
+
+    def put(self, key, data_version, expires_at, mimetype, body):
+        connection = self._connection()
+        connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                           (key, data_version, expires_at, mimetype, body))
+        connection.execute('DELETE FROM responses WHERE data_version < ? OR expires_at <= ?', (data_version, time.time()))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+class SingleFlight:
+    """
+    One computation at a time per cache key. The first request for a key runs the
+    view while concurrent requests for the same key wait, then find its result in
+    the cache. Within a worker this is a lock per key; across workers it is an
+    flock on one of LOCK_STRIPES files in lock_dir that keys are hashed onto. A
+    waiter gives up after `timeout` seconds and computes on its own, so a stuck
+    request holds up the others for no longer than that.
+    """
+    LOCK_STRIPES = 64
+
+    def __init__(self, lock_dir=None, timeout=120):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self._locks = {}  # key -> [lock, requests using it]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def __call__(self, key):
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        acquired = entry[0].acquire(timeout=self.timeout)
+        try:
+            with self._file_lock(key, deadline) if acquired else nullcontext():
+                yield
+        finally:
+            if acquired:
+                entry[0].release()
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    @contextmanager
+    def _file_lock(self, key, deadline):
+        if self.lock_dir is None or fcntl is None:
+            yield
+            return
+        os.makedirs(self.lock_dir, exist_ok=True)
+        path = os.path.join(self.lock_dir, f'{zlib.crc32(key.encode("utf-8")) % self.LOCK_STRIPES}.lock')
+        with open(path, 'a') as f:
+            locked = False
+            while not locked:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(0.02)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ResponseCache:
+    """
+    Two-tier cache of response bodies: an in-process LRU in front of an optional
+    SharedResponseStore, both with a TTL. Errors from the shared store are logged
+    and treated as misses, so it can never fail a request. `flights` (a
+    SingleFlight) coalesces concurrent misses for the same key.
+    """
+
+    def __init__(self, maxsize, ttl, shared=None, flights=None):
+        self.ttl = ttl
+        self.local = LRUCache(maxsize)
+        self.shared = shared
+        self.flights = flights
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'coalesced': 0, 'stores': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def get(self, key, recheck=False):
+        """
+        (mimetype, body, tier) for a live entry, else None. recheck=True marks the
+        lookup repeated after waiting for another request's computation: a hit then
+        counts as coalesced, and a miss is not counted a second time.
+        """
+        hit = self._lookup(key)
+        if hit is not None:
+            self._count('coalesced' if recheck else f'{hit[2]}_hits')
+        elif not recheck:
+            self._count('misses')
+        return hit
+
+    def _lookup(self, key):
+        entry = self.local.get(key)
+        if entry is not None and entry[0] > time.time():
+            return entry[1], entry[2], 'local'
+        if self.shared is not None:
+            try:
+                entry = self.shared.get(key)
+            except sqlite3.Error as e:
+                self._count('errors')
+                print(f"Error reading shared response cache: {e}")
+                entry = None
+            if entry is not None:
+                self.local.put(key, entry)
+                return entry[1], entry[2], 'shared'
+        return None
+
+    def put(self, key, data_version, mimetype, body):
+        entry = (time.time() + self.ttl, mimetype, body)
+        self.local.put(key, entry)
+        self._count('stores')
+        if self.shared is not None:
+            try:
+                self.shared.put(key, data_version, *entry)
+            except sqlite3.Error as e:
+                self._count('errors')
+                print(f"Error writing shared response cache: {e}")
+
+    def report(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        # Coalesced requests were counted as misses first but were answered from the cache.
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        hits = stats['local_hits'] + stats['shared_hits'] + stats['coalesced']
+        stats['hit_ratio'] = round(hits / lookups, 4) if lookups else None
+        stats['local_entries'] = len(self.local)
+        try:
+            stats['shared_entries'] = len(self.shared) if self.shared is not None else None
+        except sqlite3.Error:
+            stats['shared_entries'] = None
+        return stats
+
+
+def init_response_cache(app):
+    """
+    Sets up the response cache used by @cached_response. RESPONSE_CACHE_PATH is the
+    SQLite file shared between workers (None keeps the cache, and the coalescing
+    of identical requests, per process).
+    """
+    app.config.setdefault('RESPONSE_CACHE_SIZE', 128)
+    app.config.setdefault('RESPONSE_CACHE_TTL', 300)
+    app.config.setdefault('RESPONSE_CACHE_PATH', os.path.join(CACHE_DIR, 'responses.sqlite'))
+    app.config.setdefault('SINGLE_FLIGHT_TIMEOUT', 120)
+
+    path = app.config['RESPONSE_CACHE_PATH']
+    # Lock files sit next to the shared store, whose results the waiting workers pick up.
+    flights = SingleFlight(os.path.join(os.path.dirname(path), 'locks') if path else None,
+                           app.config['SINGLE_FLIGHT_TIMEOUT'])
+    app.extensions['response_cache'] = ResponseCache(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL'],
+                                                     SharedResponseStore(path) if path else None, flights)
+
+
+def response_cache_key(version):
+    """
+    Endpoint, representation, boundary layer version (for layer-dependent views),
+    data version and the query parameters in a canonical order (blank ones dropped).
+    """
+    params = sorted((k, v) for k, v in request.args.items(multi=True) if v != '')
+    return (f"{request.endpoint}|{g.get('representation') or ''}|{g.get('layer_version') or ''}"
+            f"|v{version}|{urlencode(params)}")
+
+
+def cached_response(view):
+    """
+    Serves the view's 200 responses from the response cache, keyed by
+    response_cache_key, so repeated requests for the same data version skip the
+    computation in every worker. On a miss, concurrent identical requests (in any
+    worker) wait for a single computation and share its result, so a cold cache
+    costs one run however many dashboards open at once. Goes inside @conditional.
+    The tier that answered is reported in an X-Cache header (local, shared or miss).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = current_app.extensions['response_cache']
+        version = g.get('data_version')
+        if version is None:
+            version, _ = current_data_version()
+        key = response_cache_key(version)
+
+        hit = cache.get(key)
+        if hit is None:
+            with cache.flights(key) if cache.flights is not None else nullcontext():
+                # Requests that waited on the same key find the result it just stored.
+                hit = cache.get(key, recheck=True)
+                if hit is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code == 200 and not response.is_streamed:
+                        cache.put(key, version, response.mimetype, response.get_data())
+                    response.headers['X-Cache'] = 'miss'
+                    return response
+
+        mimetype, body, tier = hit
+        response = current_app.response_class(body, mimetype=mimetype)
+        response.headers['X-Cache'] = tier
+        return response
+    return wrapper
+
@@ -0,0 +1,127 @@
+"""
+Hierarchical point clustering for map markers, in the spirit of supercluster.
+
+Points are projected to Web Mercator once. Level z (0..MAX_ZOOM) is built from
+level z + 1 by merging everything that falls in the same grid cell of RADIUS
+screen pixels at zoom z, so each cluster is exactly the union of its children
+and carries the weighted centroid and the summed per-emotion counts. Every level
+is sorted by cell id, which lets a viewport query read just the rows of cells it
+covers: the cost follows the number of clusters on screen, not the corpus size.
+"""
+import math
+import numpy as np
+
+MAX_ZOOM = 16
+# Cluster radius in pixels of a 256px tile.
+RADIUS = 40
+TILE_SIZE = 256
+# Viewports spanning more cell rows than this are answered with a plain scan.
+MAX_ROW_LOOKUPS = 2048
+
+
+def _mercator(longitudes, latitudes):
+    """Lon/lat to Web Mercator coordinates in the unit square (y pointing south)."""
+    lat = np.radians(np.clip(latitudes, -85.0511, 85.0511))
+    x = (np.asarray(longitudes, dtype=float) + 180.0) / 360.0
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2
+    return x, y
+
+
+def _lonlat(x, y):
+    return x * 360.0 - 180.0, np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * y))))
+
+
+class _Level:
+    def __init__(self, zoom, x, y, counts, emotions, ids=None):
+        self.cell_size = RADIUS / (TILE_SIZE * 2 ** zoom)
+        self.columns = math.ceil(1 / self.cell_size)
+        cells = self.cell_ids(x, y)
+        order = np.argsort(cells, kind='stable')
+        self.cells = cells[order]
+        self.x, self.y = x[order], y[order]
+        self.counts = counts[order]
+        self.emotions = emotions[order]
+        self.ids = ids[order] if ids is not None else None
+
+    def cell_ids(self, x, y):
+        cx = np.clip((x / self.cell_size).astype(np.int64), 0, self.columns - 1)
+        cy = np.clip((y / self.cell_size).astype(np.int64), 0, self.columns - 1)
+        return cy * self.columns + cx
+
+    def coarser(self, zoom):
+        """The next level up: members of each zoom-`zoom` cell merged into one cluster."""
+        parent = _Level.__new__(_Level)
+        parent.cell_size = RADIUS / (TILE_SIZE * 2 ** zoom)
+        parent.columns = math.ceil(1 / parent.cell_size)
+        cells, inverse = np.unique(parent.cell_ids(self.x, self.y), return_inverse=True)
+        counts = np.bincount(inverse, weights=self.counts)
+        parent.cells = cells
+        parent.x = np.bincount(inverse, weights=self.x * self.counts) / counts
+        parent.y = np.bincount(inverse, weights=self.y * self.counts) / counts
+        parent.counts = counts.astype(np.int64)
+        parent.emotions = np.column_stack([
+            np.bincount(inverse, weights=self.emotions[:, e], minlength=len(cells))
+            for e in range(self.emotions.shape[1])
+        ]).astype(np.int64) if self.emotions.shape[1] else np.zeros((len(cells), 0), dtype=np.int64)
+        parent.ids = None
+        return parent
+
+    def within(self, x0, y0, x1, y1):
+        """Positions (into the level arrays) of the entries inside the Mercator box."""
+        cx0, cy0, cx1, cy1 = (min(max(int(v / self.cell_size), 0), self.columns - 1) for v in (x0, y0, x1, y1))
+        if cy1 - cy0 > MAX_ROW_LOOKUPS:
+            candidates = np.arange(len(self.cells))
+        else:
+            starts = np.searchsorted(self.cells, [cy * self.columns + cx0 for cy in range(cy0, cy1 + 1)], 'left')
+            ends = np.searchsorted(self.cells, [cy * self.columns + cx1 for cy in range(cy0, cy1 + 1)], 'right')
+            candidates = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)] or [np.empty(0, dtype=np.int64)])
+        x, y = self.x[candidates], self.y[candidates]
+        return candidates[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)]
+
+
+class ClusterIndex:
+    """Clusters for every zoom from 0 to MAX_ZOOM, plus the individual points above it."""
+
+    def __init__(self, ids, longitudes, latitudes, emotions):
+        longitudes = np.asarray(longitudes, dtype=float)
+        latitudes = np.asarray(latitudes, dtype=float)
+        valid = np.isfinite(longitudes) & np.isfinite(latitudes)
+        self.emotions = sorted({e for e, ok in zip(emotions, valid) if ok and e is not None})
+        codes = {emotion: i for i, emotion in enumerate(self.emotions)}
+
+        x, y = _mercator(longitudes[valid], latitudes[valid])
+        one_hot = np.zeros((len(x), len(self.emotions)), dtype=np.int64)
+        emotion_codes = np.array([codes.get(e, -1) for e, ok in zip(emotions, valid) if ok], dtype=np.int64)
+        known = emotion_codes >= 0
+        one_hot[np.flatnonzero(known), emotion_codes[known]] = 1
+
+        leaves = _Level(MAX_ZOOM + 1, x, y, np.ones(len(x), dtype=np.int64), one_hot,
+                        ids=np.asarray(ids, dtype=np.int64)[valid])
+        self.levels = [leaves]
+        for zoom in range(MAX_ZOOM, -1, -1):
+            self.levels.append(self.levels[-1].coarser(zoom))
+        self.levels.reverse()  # index == zoom
+
+    def query(self, bbox, zoom):
+        """Clusters (and single posts) inside bbox = (min_lon, min_lat, max_lon, max_lat) at `zoom`."""
+        level = self.levels[max(0, min(zoom, MAX_ZOOM + 1))]
+        min_lon, min_lat, max_lon, max_lat = bbox
+        (x0, x1), (y1, y0) = _mercator([min_lon, max_lon], [min_lat, max_lat])
+        hits = level.within(x0, y0, x1, y1)
+        lons, lats = _lonlat(level.x[hits], level.y[hits])
+
+        results = []
+        for i, lon, lat in zip(hits.tolist(), lons.tolist(), lats.tolist()):
+            counts = level.emotions[i]
+            emotions = {self.emotions[e]: int(n) for e, n in enumerate(counts) if n}
+            item = {
+                'longitude': lon,
+                'latitude': lat,
+                'count': int(level.counts[i]),
+                'dominant_emotion': self.emotions[int(counts.argmax())] if counts.any() else None,
+                'emotions': emotions,
+            }
+            if level.ids is not None:
+                item['post_id'] = int(level.ids[i])
+            results.append(item)
+        return results
@@ -0,0 +1,119 @@
+import gzip
+import zlib
+from flask import request
+from .caching import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/geo+json',
+    'application/vnd.geo+json',
+    'application/vnd.mapbox-vector-tile',
+    'application/vnd.apache.arrow.stream',
+    'application/vnd.msgpack',
+    'text/event-stream',
+    'text/plain',
+    'text/html',
+    'text/csv',
+}
+
+
+def _available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _compress_stream(chunks, encoding, level):
+    # Every chunk is flushed so that each event / record reaches the client as soon as it is produced.
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            out = compressor.process(chunk) + compressor.flush()
+            if out:
+                yield out
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if out:
+                yield out
+        yield compressor.flush(zlib.Z_FINISH)
+
+
+def init_compression(app):
+    """
+    Negotiates gzip (and brotli when installed) for API responses.
+
+    Bodies below COMPRESS_MIN_SIZE are left alone, streamed responses are compressed
+    chunk by chunk, and responses carrying an ETag have their compressed bytes cached
+    so identical payloads are only ever compressed once. Only strong ETags (truly
+    static bodies such as /wards/geometry) get the slower static levels; weak,
+    data-version ETags change with every ingest and use the regular levels.
+    """
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BR_LEVEL', 4)
+    app.config.setdefault('COMPRESS_STATIC_GZIP_LEVEL', 9)
+    app.config.setdefault('COMPRESS_STATIC_BR_LEVEL', 11)
+    app.config.setdefault('COMPRESS_CACHE_SIZE', 64)
+
+    # Already-compressed bodies keyed by URL, ETag and encoding.
+    variants = LRUCache(app.config['COMPRESS_CACHE_SIZE'])
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers or response.direct_passthrough):
+            return response
+
+        encoding = request.accept_encodings.best_match(_available_encodings())
+        if encoding is None:
+            return response
+        prefix = 'BR' if encoding == 'br' else 'GZIP'
+
+        if response.is_streamed:
+            level = app.config[f'COMPRESS_{prefix}_LEVEL']
+            response.response = _compress_stream(response.response, encoding, level)
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        etag, weak = response.get_etag()
+        if etag:
+            key = (request.full_path, etag, weak, encoding)
+            body = variants.get(key)
+            if body is None:
+                level = app.config[f'COMPRESS_{prefix}_LEVEL' if weak else f'COMPRESS_STATIC_{prefix}_LEVEL']
+                body = compress(data, encoding, level)
+                variants.put(key, body)
+            if not weak:
+                # A strong validator identifies exact bytes, so each encoding needs its own.
+                response.set_etag(f'{etag}-{encoding}')
+        else:
+            body = compress(data, encoding, app.config[f'COMPRESS_{prefix}_LEVEL'])
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
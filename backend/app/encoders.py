@@ -0,0 +1,108 @@
+from functools import wraps
+from flask import g, jsonify, make_response, request
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pyarrow is optional; Arrow is simply not offered without it
+    pa = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+MSGPACK_MIMETYPE = 'application/vnd.msgpack'
+
+# Low-cardinality string columns that are shipped as dictionary + integer codes.
+DICTIONARY_COLUMNS = ('emotion', 'city', 'ward', 'constituency')
+
+
+def _offered():
+    offered = [('application/json', 'json')]
+    if pa is not None:
+        offered.append((ARROW_MIMETYPE, 'arrow'))
+    if msgpack is not None:
+        offered += [(MSGPACK_MIMETYPE, 'msgpack'), ('application/msgpack', 'msgpack'), ('application/x-msgpack', 'msgpack')]
+    return offered
+
+
+def negotiated(view):
+    """
+    Picks the response representation from the Accept header and stores it in
+    g.representation ('json', 'arrow' or 'msgpack') for the view and for the
+    ETag computed by caching.conditional. Unsatisfiable Accept headers get a 406.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        offered = _offered()
+        if not request.accept_mimetypes:
+            g.representation = 'json'
+        else:
+            best = request.accept_mimetypes.best_match([mimetype for mimetype, _ in offered])
+            if best is None:
+                return jsonify({
+                    'message': 'Not acceptable',
+                    'available': [mimetype for mimetype, _ in offered],
+                }), 406
+            g.representation = dict(offered)[best]
+        response = make_response(view(*args, **kwargs))
+        response.vary.add('Accept')
+        return response
+    return wrapper
+
+
+def _dictionary_encode(values):
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    return codes.astype('int32'), list(uniques)
+
+
+def _arrow_body(columns):
+    arrays = {}
+    for name, values in columns.items():
+        if name in DICTIONARY_COLUMNS:
+            codes, dictionary = _dictionary_encode(values)
+            arrays[name] = pa.DictionaryArray.from_arrays(
+                pa.array(codes, mask=codes < 0), pa.array(dictionary, type=pa.string())
+            )
+        else:
+            arrays[name] = pa.array(values)
+    table = pa.table(arrays)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _msgpack_body(columns):
+    encoded = {}
+    for name, values in columns.items():
+        if name in DICTIONARY_COLUMNS:
+            codes, dictionary = _dictionary_encode(values)
+            encoded[name] = {'dictionary': dictionary, 'codes': codes.tolist()}
+        else:
+            encoded[name] = list(values)
+    length = len(next(iter(columns.values()))) if columns else 0
+    return msgpack.packb({'length': length, 'columns': encoded}, use_bin_type=True)
+
+
+def columnar_response(columns, rows=None):
+    """
+    Encodes a dict of equal-length columns for the negotiated representation.
+    JSON clients get row objects (built from the columns unless given explicitly).
+    """
+    representation = g.get('representation', 'json')
+    if representation == 'arrow':
+        response = make_response(_arrow_body(columns))
+        response.mimetype = ARROW_MIMETYPE
+        return response
+    if representation == 'msgpack':
+        response = make_response(_msgpack_body(columns))
+        response.mimetype = MSGPACK_MIMETYPE
+        return response
+    if rows is None:
+        names = list(columns)
+        rows = [dict(zip(names, values)) for values in zip(*columns.values())]
+    return jsonify(rows)
@@ -0,0 +1,503 @@
+import hashlib
+import math
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import shapely
+from shapely.geometry import mapping
+from . import topojson
+
+# --- THIS IS THE CORRECTED FILE PATH ---
+# It now correctly navigates up one level from /app to /backend
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+
+def load_boundary_geojson(geojson_path):
+    if not os.path.exists(geojson_path):
+        raise FileNotFoundError(f"GeoJSON file not found at the specified path: {geojson_path}")
+
+    # Imported here: with a boundary cache (see load_layer_cache) workers never need geopandas.
+    import geopandas as gpd
+    gdf = gpd.read_file(geojson_path)
+    if gdf.crs is None: gdf.set_crs("EPSG:4326", inplace=True)
+    return gdf
+# -----------------------------------------
+
+def file_digest(path):
+    """Hex SHA-256 of a file's contents; identifies a boundary file version."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class PointInPolygonIndex:
+    """
+    Bulk point-in-polygon engine over a fixed set of prepared polygons.
+
+    The STRtree answers area queries (which polygons touch a box). Bulk point
+    lookups skip building shapely Point objects, which alone costs ~0.8 s per
+    million points: points are sorted by longitude once, each polygon's bounding
+    box selects its candidates with two binary searches, and the candidates are
+    tested in a single vectorized contains_xy call against the prepared polygons.
+    """
+
+    def __init__(self, geometries):
+        self.geometries = geometries
+        shapely.prepare(self.geometries)
+        self.bounds = shapely.bounds(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def candidates(self, longitudes, latitudes):
+        """(point_idx, polygon_idx) pairs whose polygon bounding box contains the point."""
+        order = np.argsort(longitudes, kind='stable')
+        sorted_lon = longitudes[order]
+        lo = np.searchsorted(sorted_lon, self.bounds[:, 0], side='left')
+        hi = np.searchsorted(sorted_lon, self.bounds[:, 2], side='right')
+        point_idx, polygon_idx = [], []
+        for i in np.flatnonzero(hi > lo):
+            in_x = order[lo[i]:hi[i]]
+            lat = latitudes[in_x]
+            in_box = in_x[(lat >= self.bounds[i, 1]) & (lat <= self.bounds[i, 3])]
+            point_idx.append(in_box)
+            polygon_idx.append(np.full(len(in_box), i, dtype=np.int64))
+        if not point_idx:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(point_idx), np.concatenate(polygon_idx)
+
+    def locate(self, longitudes, latitudes):
+        """
+        Returns an int32 array with the index of the polygon containing each point,
+        or -1 where no polygon does (or the coordinates are missing). A point on a
+        boundary shared by two polygons is in neither polygon's interior and gets -1,
+        the same as predicate='within'.
+        """
+        longitudes = np.asarray(longitudes, dtype=float)
+        latitudes = np.asarray(latitudes, dtype=float)
+        result = np.full(len(longitudes), -1, dtype=np.int32)
+        valid = np.flatnonzero(np.isfinite(longitudes) & np.isfinite(latitudes))
+        if not len(valid):
+            return result
+
+        lon, lat = longitudes[valid], latitudes[valid]
+        point_idx, polygon_idx = self.candidates(lon, lat)
+        inside = shapely.contains_xy(self.geometries[polygon_idx], lon[point_idx], lat[point_idx])
+        # Overlapping polygons (bad data) resolve to the lowest index.
+        found = np.full(len(valid), len(self.geometries), dtype=np.int64)
+        np.minimum.at(found, point_idx[inside], polygon_idx[inside])
+        hit = found < len(self.geometries)
+        result[valid[hit]] = found[hit]
+        return result
+
+# Lookup raster: cell size in degrees (about 55 m at Hyderabad's latitude) and the
+# two cell markers besides a ward id.
+GRID_CELL_SIZE = 0.0005
+GRID_OUTSIDE = -1
+GRID_EXACT = -2
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
+
+class LookupGrid:
+    """
+    Raster over a layer's bounding box for constant-time point lookups. A cell holds
+    the id of the ward that contains it entirely, GRID_OUTSIDE when it touches no
+    ward, or GRID_EXACT when a ward boundary crosses it and only an exact
+    point-in-polygon test can tell. The cells live in a .npy file that is memory
+    mapped, so every worker shares one copy through the page cache.
+    """
+
+    def __init__(self, cells, bounds, cell_size=GRID_CELL_SIZE):
+        self.cells = cells
+        self.cell_size = cell_size
+        self.origin = self.grid_origin(bounds, cell_size)
+
+    @staticmethod
+    def grid_origin(bounds, cell_size):
+        return math.floor(bounds[0] / cell_size) * cell_size, math.floor(bounds[1] / cell_size) * cell_size
+
+    @classmethod
+    def build(cls, geometries, tree, bounds, cell_size=GRID_CELL_SIZE):
+        x0, y0 = cls.grid_origin(bounds, cell_size)
+        columns = math.ceil((bounds[2] - x0) / cell_size)
+        rows = math.ceil((bounds[3] - y0) / cell_size)
+        dtype = np.int16 if len(geometries) < np.iinfo(np.int16).max else np.int32
+        cells = np.full(rows * columns, GRID_OUTSIDE, dtype=dtype)
+
+        xs, ys = np.meshgrid(x0 + np.arange(columns) * cell_size, y0 + np.arange(rows) * cell_size)
+        boxes = shapely.box(xs.ravel(), ys.ravel(), xs.ravel() + cell_size, ys.ravel() + cell_size)
+        box_idx, polygon_idx = tree.query(boxes, predicate='intersects')
+        cells[box_idx] = GRID_EXACT
+        # contains_properly: a point on the cell's edge is still strictly inside the ward.
+        inside = shapely.contains_properly(geometries[polygon_idx], boxes[box_idx])
+        cells[box_idx[inside]] = polygon_idx[inside]
+        return cls(cells.reshape(rows, columns), bounds, cell_size)
+
+    def lookup(self, longitudes, latitudes):
+        """Cell value for each point: a ward id, GRID_OUTSIDE or GRID_EXACT."""
+        col = np.floor((longitudes - self.origin[0]) / self.cell_size)
+        row = np.floor((latitudes - self.origin[1]) / self.cell_size)
+        rows, columns = self.cells.shape
+        valid = (row >= 0) & (row < rows) & (col >= 0) & (col < columns)  # also False for NaN
+        result = np.full(len(longitudes), GRID_OUTSIDE, dtype=np.int32)
+        result[valid] = self.cells[row[valid].astype(np.int64), col[valid].astype(np.int64)]
+        return result
+
+def lookup_grid_path(name, version, cell_size=GRID_CELL_SIZE):
+    return os.path.join(CACHE_DIR, f'{name}-grid-{version}-{cell_size:g}.npy')
+
+def load_lookup_grid(layer, cell_size=GRID_CELL_SIZE):
+    """The layer's lookup raster from the cache directory (memory mapped), or None if it was not built."""
+    path = lookup_grid_path(layer.name, layer.version, cell_size)
+    if not os.path.exists(path):
+        return None
+    bounds = shapely.total_bounds(layer.geometries)
+    return LookupGrid(np.load(path, mmap_mode='r'), bounds, cell_size)
+
+def _write_atomically(path, write):
+    # Written under a temporary name and renamed, so a worker never reads a half-written file.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def build_lookup_grid(layer, cell_size=GRID_CELL_SIZE):
+    """Builds the layer's lookup raster and saves it where load_lookup_grid finds it."""
+    grid = LookupGrid.build(layer.geometries, layer.index.tree, shapely.total_bounds(layer.geometries), cell_size)
+    _write_atomically(lookup_grid_path(layer.name, layer.version, cell_size), lambda f: np.save(f, grid.cells))
+    return grid
+
+# Precomputed simplification levels, in degrees. 0.0 is the untouched boundary file.
+SIMPLIFY_TOLERANCES = (0.0, 0.0001, 0.0003, 0.001, 0.002, 0.004)
+
+# Requested zooms are clamped to 0..MAX_MAP_ZOOM; beyond it every level is full detail anyway.
+MAX_MAP_ZOOM = 22
+
+def pixel_size(zoom):
+    """Width of one 256px web-map tile pixel in degrees of longitude at the given zoom."""
+    return 360.0 / (256 * 2 ** zoom)
+
+def simplified_geometries(geometries, tolerance):
+    """
+    A polygon coverage simplified at `tolerance` degrees. coverage_simplify
+    simplifies each shared edge once, so neighbouring wards keep identical borders
+    (no slivers or gaps). Coordinates are then rounded to about a tenth of the
+    tolerance, which keeps shared vertices identical and trims bytes.
+    """
+    if not tolerance:
+        return geometries
+    if hasattr(shapely, 'coverage_simplify'):
+        simplified = shapely.coverage_simplify(geometries, tolerance)
+    else:  # GEOS < 3.12: per-polygon simplification, borders may no longer match exactly
+        simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+    decimals = math.ceil(-math.log10(tolerance)) + 1
+    return shapely.transform(simplified, lambda coords: np.round(coords, decimals))
+
+# Approximate resident size of one stored vertex: GEOS coordinates plus the GeoJSON
+# lists of Python floats built from them (measured on the GHMC wards).
+BYTES_PER_COORDINATE = 160
+
+class BoundaryLayer:
+    """
+    A boundary file preprocessed once per process so that request handlers only
+    join precomputed pieces: a name -> id map, prepared shapely geometries with
+    their bounds and spatial index, and each geometry simplified (and converted
+    to a GeoJSON dict) at every level in SIMPLIFY_TOLERANCES. Ids are row positions,
+    so every per-ward array lines up with them.
+    """
+
+    def __init__(self, names, geometries, name=None, version=None, levels=None, geojson_levels=None):
+        self.name = name
+        self.version = version
+        self.names = list(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.index = PointInPolygonIndex(self.geometries)
+        self.bounds = self.index.bounds
+        # The simplified levels and their GeoJSON are passed in when loaded from the boundary cache.
+        if levels is None:
+            levels = {tolerance: simplified_geometries(self.geometries, tolerance) for tolerance in SIMPLIFY_TOLERANCES}
+        self.levels = levels
+        if geojson_levels is None:
+            geojson_levels = {
+                tolerance: [mapping(geometry) for geometry in geometries] for tolerance, geometries in levels.items()
+            }
+        self.geojson_levels = geojson_levels
+        self.geojson = self.geojson_levels[0.0]
+        self.memory_estimate = BYTES_PER_COORDINATE * sum(
+            int(shapely.get_num_coordinates(geometries).sum()) for geometries in levels.values()
+        )
+        # Serialized responses derived from this layer, filled in by the routes that serve them.
+        self.encoded = {}
+        # Optional LookupGrid that answers most point lookups without a polygon test.
+        self.grid = None
+
+    @classmethod
+    def from_gdf(cls, gdf, name_field='name', name=None, version=None):
+        return cls(gdf[name_field].tolist(), gdf.geometry.values, name=name, version=version)
+
+    def __len__(self):
+        return len(self.names)
+
+    def tolerance_for(self, zoom=None, tolerance=None):
+        """
+        The coarsest precomputed level not exceeding the requested tolerance, or one
+        map pixel at the requested zoom. Full detail when neither is given (or the
+        tolerance is negative or NaN).
+        """
+        if tolerance is None:
+            tolerance = pixel_size(min(max(zoom, 0), MAX_MAP_ZOOM)) if zoom is not None else 0.0
+        if not tolerance >= 0:  # negative or NaN
+            tolerance = 0.0
+        return max(level for level in SIMPLIFY_TOLERANCES if level <= tolerance)
+
+    def feature_collection(self, tolerance=0.0):
+        geojson = self.geojson_levels[tolerance]
+        return {
+            'type': 'FeatureCollection',
+            'features': [
+                {'type': 'Feature', 'id': i, 'geometry': geometry, 'properties': {'name': self.names[i]}}
+                for i, geometry in enumerate(geojson)
+            ],
+        }
+
+    def topology(self, tolerance=0.0):
+        return topojson.encode(self.geojson_levels[tolerance], properties=[{'name': name} for name in self.names],
+                               object_name=self.name or 'areas', ids=list(range(len(self))))
+
+    def locate(self, longitudes, latitudes):
+        """Ward id for each coordinate pair, -1 outside the layer (see PointInPolygonIndex.locate)."""
+        if self.grid is None:
+            return self.index.locate(longitudes, latitudes)
+        longitudes = np.asarray(longitudes, dtype=float)
+        latitudes = np.asarray(latitudes, dtype=float)
+        result = self.grid.lookup(longitudes, latitudes)
+        exact = np.flatnonzero(result == GRID_EXACT)
+        if len(exact):
+            result[exact] = self.index.locate(longitudes[exact], latitudes[exact])
+        return result
+
+# Bump when the pickled layout below changes; older cache files are then ignored.
+LAYER_CACHE_FORMAT = 1
+
+def layer_cache_path(name, version):
+    return os.path.join(CACHE_DIR, f'{name}-layer-{version}.pickle')
+
+def save_layer_cache(layer):
+    """
+    Pickles the preprocessed layer as WKB plus metadata, keyed by the boundary file
+    hash, so workers skip parsing the GeoJSON, simplifying and even importing geopandas.
+    """
+    data = {
+        'format': LAYER_CACHE_FORMAT,
+        'name': layer.name,
+        'version': layer.version,
+        'names': layer.names,
+        'levels': {tolerance: shapely.to_wkb(geometries) for tolerance, geometries in layer.levels.items()},
+        'geojson_levels': layer.geojson_levels,
+    }
+    _write_atomically(layer_cache_path(layer.name, layer.version), lambda f: pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+def load_layer_cache(name, version):
+    """The cached BoundaryLayer for a boundary file version, or None when there is no usable cache."""
+    path = layer_cache_path(name, version)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('format') != LAYER_CACHE_FORMAT or data.get('version') != version:
+            return None
+        levels = {tolerance: shapely.from_wkb(wkb) for tolerance, wkb in data['levels'].items()}
+        return BoundaryLayer(data['names'], levels[0.0], name=name, version=version,
+                             levels=levels, geojson_levels=data['geojson_levels'])
+    except Exception as e:
+        print(f"Ignoring unreadable boundary cache {path}: {e}")
+        return None
+
+# Boundary layers that can be served: name -> (GeoJSON file in data/, property holding
+# the area name). Layers whose file is not present are reported as unavailable.
+BOUNDARY_LAYERS = {
+    'wards': ('ghmc-wards.geojson', 'name'),
+    'assembly_constituencies': ('assembly-constituencies.geojson', 'name'),
+    'districts': ('districts.geojson', 'name'),
+    'mandals': ('mandals.geojson', 'name'),
+}
+WARD_LAYER = 'wards'
+BOUNDARY_MEMORY_BUDGET = int(os.getenv('BOUNDARY_MEMORY_BUDGET_MB', '512')) * 2 ** 20
+# Seconds between checks of a loaded layer's file for changes.
+BOUNDARY_CHECK_INTERVAL = float(os.getenv('BOUNDARY_CHECK_INTERVAL', '10'))
+
+class UnknownLayer(LookupError):
+    """A boundary layer that is not configured or whose file is missing."""
+
+def load_boundary_layer(name, path, name_field='name', build_missing=False):
+    """
+    A preprocessed layer from its boundary cache when present, else from the GeoJSON.
+    With build_missing, a missing cache and lookup raster are built and saved too.
+    """
+    if not os.path.exists(path):
+        raise UnknownLayer(f"Boundary layer {name!r} is not available")
+    version = file_digest(path)[:16]
+    layer = load_layer_cache(name, version)
+    if layer is None:
+        layer = BoundaryLayer.from_gdf(load_boundary_geojson(path), name_field, name=name, version=version)
+        if build_missing:
+            save_layer_cache(layer)
+    layer.grid = load_lookup_grid(layer)
+    if layer.grid is None and build_missing:
+        layer.grid = build_lookup_grid(layer)
+    return layer
+
+class BoundaryRegistry:
+    """
+    Lazily loaded boundary layers shared by the process. Each layer is built on its
+    first request (one loader per layer, others wait for it) and kept in LRU order;
+    when the estimated size of the loaded layers exceeds the memory budget, the
+    least recently used ones are dropped and rebuilt on their next request.
+
+    Loaded layers are hot-reloaded: check_for_updates (run before every request)
+    stats each layer's file at most every check_interval seconds, and when it
+    changed a background thread builds the new layer (and its caches) while the
+    old one keeps serving, then swaps it in.
+    Listeners registered with on_load(callback) are called as callback(layer)
+    after every load or swap, from the thread that did it.
+    """
+
+    def __init__(self, layers=BOUNDARY_LAYERS, memory_budget=BOUNDARY_MEMORY_BUDGET,
+                 check_interval=BOUNDARY_CHECK_INTERVAL):
+        self.layers = dict(layers)
+        self.memory_budget = memory_budget
+        self.check_interval = check_interval
+        self.listeners = []
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self.layers}
+        self._file_stats = {}
+        self._checked_at = {}
+        self._reloading = set()
+
+    def on_load(self, callback):
+        self.listeners.append(callback)
+        return callback
+
+    def _notify(self, layer):
+        for callback in list(self.listeners):
+            try:
+                callback(layer)
+            except Exception as e:
+                print(f"Error in boundary layer listener: {e}")
+
+    def _file_stat(self, name):
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def path(self, name):
+        return os.path.join(DATA_DIR, self.layers[name][0])
+
+    def available(self):
+        return [name for name in self.layers if os.path.exists(self.path(name))]
+
+    def loaded(self):
+        with self._lock:
+            return list(self._loaded)
+
+    def _cached(self, name):
+        with self._lock:
+            layer = self._loaded.get(name)
+            if layer is not None:
+                self._loaded.move_to_end(name)
+            return layer
+
+    def get(self, name):
+        if name not in self.layers:
+            raise UnknownLayer(f"Unknown boundary layer {name!r}; expected one of {', '.join(self.layers)}")
+        layer = self._cached(name)
+        if layer is not None:
+            return layer
+        with self._load_locks[name]:
+            layer = self._cached(name)
+            if layer is None:
+                # Stat first: a change made while loading is then picked up by the next check.
+                file_stat = self._file_stat(name)
+                layer = load_boundary_layer(name, self.path(name), self.layers[name][1])
+                with self._lock:
+                    self._loaded[name] = layer
+                    self._file_stats[name] = file_stat
+                    self._checked_at[name] = time.monotonic()
+                    self._evict(keep=name)
+                self._notify(layer)
+        return layer
+
+    def check_for_updates(self):
+        """
+        Starts a background reload of every loaded layer whose file changed. Cheap
+        enough to call before each request: each file is stat'ed at most every
+        check_interval seconds.
+        """
+        for name in self.loaded():
+            self._check_for_update(name)
+
+    def _check_for_update(self, name):
+        now = time.monotonic()
+        with self._lock:
+            if name in self._reloading or now - self._checked_at.get(name, 0) < self.check_interval:
+                return
+            self._checked_at[name] = now
+        file_stat = self._file_stat(name)
+        with self._lock:
+            if file_stat is None or file_stat == self._file_stats.get(name) or name in self._reloading:
+                return
+            self._reloading.add(name)
+        threading.Thread(target=self._reload, args=(name, file_stat), name=f'boundary-reload-{name}',
+                         daemon=True).start()
+
+    def _reload(self, name, file_stat):
+        try:
+            with self._lock:
+                current = self._loaded.get(name)
+            if current is not None and file_digest(self.path(name))[:16] == current.version:
+                with self._lock:
+                    self._file_stats[name] = file_stat  # touched, not changed
+                return
+            layer = load_boundary_layer(name, self.path(name), self.layers[name][1], build_missing=True)
+            with self._lock:
+                if name not in self._loaded:
+                    return  # evicted meanwhile; the next request loads the new file anyway
+                self._loaded[name] = layer  # keeps its LRU position
+                self._file_stats[name] = file_stat
+            print(f"Boundary layer {name!r} reloaded: {current.version if current else None} -> {layer.version}")
+            self._notify(layer)
+        except Exception as e:
+            # Most likely a file caught mid-write; the old layer keeps serving and the next check retries.
+            print(f"Error reloading boundary layer {name!r}: {e}")
+        finally:
+            with self._lock:
+                self._reloading.discard(name)
+
+    def _evict(self, keep):
+        total = sum(layer.memory_estimate for layer in self._loaded.values())
+        for name in list(self._loaded):
+            if total <= self.memory_budget:
+                break
+            if name != keep:
+                total -= self._loaded.pop(name).memory_estimate
+                self._file_stats.pop(name, None)
+
+boundaries = BoundaryRegistry()
+
+def get_boundary_layer(name=WARD_LAYER):
+    return boundaries.get(name)
+
+def get_ward_layer():
+    """The preprocessed GHMC ward layer, built on first use and then shared by the process."""
+    return boundaries.get(WARD_LAYER)
+
+def assign_wards(longitudes, latitudes):
+    """Returns the name of the ward containing each coordinate pair, or None outside GHMC."""
+    layer = get_ward_layer()
+    return [layer.names[i] if i >= 0 else None for i in layer.locate(longitudes, latitudes)]
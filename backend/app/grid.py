@@ -0,0 +1,74 @@
+"""
+Geohash grid cells for heatmap-style aggregation.
+
+A geohash interleaves longitude and latitude bits and writes them five at a
+time in base 32, so every prefix of a cell id is the enclosing coarser cell.
+Posts store one fine geohash (GEOHASH_PRECISION characters); any coarser grid
+is then a GROUP BY on a prefix, with no geometry work per request.
+"""
+import numpy as np
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# 9 characters is a cell of roughly 5 m x 5 m.
+GEOHASH_PRECISION = 9
+
+_ALPHABET = np.frombuffer(BASE32.encode('ascii'), dtype=np.uint8)
+_DECODE = {c: i for i, c in enumerate(BASE32)}
+
+
+def _bit_split(precision):
+    bits = 5 * precision
+    return bits, (bits + 1) // 2, bits // 2  # total, longitude bits, latitude bits
+
+
+def geohash_encode(latitudes, longitudes, precision=GEOHASH_PRECISION):
+    """
+    Geohash of each coordinate pair, vectorized over the arrays. Returns an object
+    array of strings, with None where a coordinate is missing or out of range.
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    bits, lon_bits, lat_bits = _bit_split(precision)
+    valid = (np.isfinite(latitudes) & np.isfinite(longitudes)
+             & (np.abs(latitudes) <= 90) & (np.abs(longitudes) <= 180))
+
+    lon_q = np.zeros(len(longitudes), dtype=np.int64)
+    lat_q = np.zeros(len(latitudes), dtype=np.int64)
+    lon_q[valid] = np.minimum(((longitudes[valid] + 180) / 360 * (1 << lon_bits)).astype(np.int64), (1 << lon_bits) - 1)
+    lat_q[valid] = np.minimum(((latitudes[valid] + 90) / 180 * (1 << lat_bits)).astype(np.int64), (1 << lat_bits) - 1)
+
+    # Interleave from the most significant bit: longitude on even positions, latitude on odd ones.
+    code = np.zeros(len(longitudes), dtype=np.int64)
+    for i in range(bits):
+        if i % 2 == 0:
+            bit = (lon_q >> (lon_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_q >> (lat_bits - 1 - i // 2)) & 1
+        code = (code << 1) | bit
+
+    shifts = 5 * np.arange(precision - 1, -1, -1)
+    chars = _ALPHABET[(code[:, None] >> shifts) & 31]
+    hashes = chars.view(f'S{precision}').ravel().astype(str).astype(object)
+    hashes[~valid] = None
+    return hashes
+
+
+def geohash_bounds(cells):
+    """(n, 4) array of [min_lon, min_lat, max_lon, max_lat] for geohash strings of any length."""
+    bounds = np.empty((len(cells), 4))
+    for row, cell in enumerate(cells):
+        bits, lon_bits, lat_bits = _bit_split(len(cell))
+        code = 0
+        for c in cell:
+            code = (code << 5) | _DECODE[c]
+        lon_q = lat_q = 0
+        for i in range(bits):
+            bit = (code >> (bits - 1 - i)) & 1
+            if i % 2 == 0:
+                lon_q = (lon_q << 1) | bit
+            else:
+                lat_q = (lat_q << 1) | bit
+        lon_size, lat_size = 360 / (1 << lon_bits), 180 / (1 << lat_bits)
+        min_lon, min_lat = lon_q * lon_size - 180, lat_q * lat_size - 90
+        bounds[row] = (min_lon, min_lat, min_lon + lon_size, min_lat + lat_size)
+    return bounds
@@ -0,0 +1,53 @@
+from datetime import date, datetime
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib-backed provider is used instead
+    orjson = None
+
+
+def _default(o):
+    # numpy / pandas scalars show up whenever results come straight out of a DataFrame.
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Flask's stdlib provider, taught about numpy scalars and ISO dates."""
+    default = staticmethod(_default)
+    sort_keys = False
+
+
+class OrjsonProvider(NumpyJSONProvider):
+    """Serializes straight to bytes with orjson, skipping the str round-trip in responses."""
+    options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def _dumps_bytes(self, obj, indent=False):
+        option = self.options | orjson.OPT_INDENT_2 if indent else self.options
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Callers asking for stdlib-specific arguments (cls, separators, ...) get the stdlib path.
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+JSONProvider = OrjsonProvider if orjson is not None else NumpyJSONProvider
@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+from . import db
+from .models import Post, current_data_version
+from .queries import column_rows, format_cursor, post_changes, ward_stats
+
+# Upper bound on posts replayed or pushed in a single event; larger writes span several events.
+MAX_EVENT_POSTS = 5000
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.extend(f'data: {line}' for line in data.splitlines() or [''])
+    return '\n'.join(lines) + '\n\n'
+
+
+class SubscriberLimitReached(RuntimeError):
+    """The worker already streams to LIVE_MAX_SUBSCRIBERS clients; routes answer it with 503."""
+
+
+class Subscription:
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+
+class Publisher:
+    """
+    Per-process fan-out for the live feed. A single background thread polls the
+    data version; when it moves, the new or reclassified posts and the refreshed
+    aggregates of the wards they touch are serialized once and queued to every
+    subscriber. The database is the bus, so each gunicorn worker runs its own
+    publisher and the polling load does not depend on how many dashboards are open.
+
+    Every open stream does occupy one of the worker's threads, so a worker takes
+    at most max_subscribers of them (LIVE_MAX_SUBSCRIBERS) and keeps its other
+    threads for ordinary API requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('LIVE_POLL_INTERVAL', 2.0)
+        self.queue_size = app.config.get('LIVE_QUEUE_SIZE', 100)
+        self.max_subscribers = app.config.get('LIVE_MAX_SUBSCRIBERS', 4)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.version = None
+
+    def subscribe(self):
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise SubscriberLimitReached(f'This worker already serves {self.max_subscribers} live streams')
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                with self.app.app_context():
+                    self.version, _ = current_data_version()
+                    db.session.remove()
+                self._thread = threading.Thread(target=self._run, name='live-publisher', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    # Nobody is listening; the next subscribe() starts a fresh thread.
+                    self._thread = None
+                    return
+            try:
+                with self.app.app_context():
+                    self._poll()
+                    db.session.remove()
+            except Exception as e:
+                print(f"Error in live publisher: {e}")
+
+    def _poll(self):
+        version, _ = current_data_version()
+        if version == self.version:
+            return
+        events = changes_events(self.app, (self.version, None), version)
+        self.version = version
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for cursor, payload in events:
+                try:
+                    subscription.queue.put_nowait((cursor, payload))
+                except queue.Full:
+                    # A client that cannot keep up is dropped; it reconnects and resumes via Last-Event-ID.
+                    subscription.overflowed = True
+                    self.unsubscribe(subscription)
+                    break
+
+
+def changes_events(app, since, version):
+    """
+    Builds the serialized 'posts' and 'wards' events covering writes after the
+    `since` cursor up to `version`. The posts event id is the changes cursor it
+    brings the client up to (see queries.parse_cursor).
+    """
+    events = []
+    has_more = since[0] < version or since[1] is not None  # a cursor inside a write has rows left
+    while has_more:
+        columns, cursor, has_more = post_changes(Post.query, since, version, MAX_EVENT_POSTS)
+        posts = column_rows(columns)
+        event_id = format_cursor(cursor)
+        events.append((cursor, format_event('posts', app.json.dumps({'cursor': event_id, 'posts': posts}), event_id)))
+
+        wards = {post['ward'] for post in posts if post['ward']}
+        if wards:
+            aggregates = ward_stats(Post.query.filter(Post.ward.in_(wards)))
+            events.append((cursor, format_event('wards', app.json.dumps(aggregates))))
+        since = cursor
+    return events
+
+
+def get_publisher(app):
+    publisher = app.extensions.get('live')
+    if publisher is None:
+        publisher = app.extensions.setdefault('live', Publisher(app))
+    return publisher
+
+
+def event_stream(app, subscription, last_event_id=None):
+    """
+    Generator for one SSE client subscribed with get_publisher(app).subscribe():
+    optional replay from Last-Event-ID, then live events from the publisher, with
+    comment heartbeats while idle. Unsubscribes when it finishes.
+    """
+    publisher = get_publisher(app)
+    heartbeat = app.config.get('LIVE_HEARTBEAT_INTERVAL', 15.0)
+    try:
+        yield f"retry: {int(app.config.get('LIVE_RETRY_MS', 5000))}\n\n"
+        sent_through = None
+        if last_event_id is not None:
+            with app.app_context():
+                version, _ = current_data_version()
+                for cursor, payload in changes_events(app, last_event_id, version):
+                    yield payload
+                db.session.remove()
+            sent_through = version
+        while not subscription.overflowed:
+            try:
+                cursor, payload = subscription.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': heartbeat\n\n'
+                continue
+            if sent_through is not None and cursor[0] <= sent_through:
+                continue  # already delivered by the replay
+            yield payload
+    finally:
+        publisher.unsubscribe(subscription)
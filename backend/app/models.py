@@ -1,7 +1,11 @@
+from datetime import datetime, timezone
 from . import db
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.orm import Session
 from flask_login import UserMixin # New import
 from werkzeug.security import generate_password_hash, check_password_hash # New import
 from . import login_manager # New import
+from .grid import geohash_encode
 
 # This function is required by Flask-Login to load a user
 @login_manager.user_loader
@@ -22,13 +26,25 @@ class User(UserMixin, db.Model):
 
 # Existing Post class (no changes needed)
 class Post(db.Model):
+    __table_args__ = (
+        # Viewport (bbox) queries: range on latitude, longitude checked from the index.
+        db.Index('ix_post_latitude_longitude', 'latitude', 'longitude'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    timestamp = db.Column(db.String(50))
+    timestamp = db.Column(db.String(50), index=True)
     text = db.Column(db.Text, nullable=False)
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
-    city = db.Column(db.String(100))
+    city = db.Column(db.String(100), index=True)
+    ward = db.Column(db.String(100), index=True)
+    # Assembly constituency the coordinates fall in (see app/assignments.py).
+    constituency = db.Column(db.String(100), index=True)
     emotion = db.Column(db.String(50))
+    # Data version of the write that last inserted or changed this row (see DataVersion).
+    change_seq = db.Column(db.Integer, index=True)
+    # Fine geohash of the coordinates; its prefixes are the coarser grid cells (see app/grid.py).
+    geohash = db.Column(db.String(12), index=True)
 
     def to_dict(self):
         return {
@@ -38,5 +54,59 @@ class Post(db.Model):
             'latitude': self.latitude,
             'longitude': self.longitude,
             'city': self.city,
+            'ward': self.ward,
+            'constituency': self.constituency,
             'emotion': self.emotion
-        }
\ No newline at end of file
+        }
+
+# Single-row counter that is bumped whenever posts are ingested or reclassified.
+# HTTP validators (ETag / Last-Modified) are derived from it.
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+# Boundary file version (see geo.BoundaryLayer.version) that the stored per-post
+# assignments such as Post.ward were computed from, one row per boundary layer.
+class BoundaryVersion(db.Model):
+    __tablename__ = 'boundary_version'
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+def current_data_version():
+    """Returns (version, updated_at) with updated_at as an aware UTC datetime."""
+    table = DataVersion.__table__
+    # A plain SELECT rather than session.get(), so a long-lived session never sees a stale identity-map copy.
+    row = db.session.execute(select(table.c.version, table.c.updated_at).where(table.c.id == 1)).first()
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at.replace(tzinfo=timezone.utc)
+
+def bump_data_version(session):
+    """Atomically increments the data version inside the session's transaction and returns it."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    table = DataVersion.__table__
+    result = session.execute(
+        update(table).where(table.c.id == 1).values(version=table.c.version + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        session.execute(insert(table).values(id=1, version=1, updated_at=now))
+    return session.execute(select(table.c.version).where(table.c.id == 1)).scalar_one()
+
+@event.listens_for(Session, 'before_flush')
+def _bump_on_post_write(session, flush_context, instances):
+    # Any new, modified or deleted Post invalidates every derived response, and
+    # inserted / changed rows are stamped so /analytics/changes can find them.
+    # The geohash is kept in step with the coordinates.
+    written = [obj for obj in session.new if isinstance(obj, Post)]
+    written += [obj for obj in session.dirty if isinstance(obj, Post) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Post)]
+    if written or deleted:
+        version = bump_data_version(session)
+        for post in written:
+            post.change_seq = version
+            state = inspect(post)
+            if state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes():
+                post.geohash = geohash_encode([post.latitude], [post.longitude])[0]
@@ -0,0 +1,260 @@
+"""
+Mapbox Vector Tile (MVT 2.1) encoding for ward polygons and post points.
+
+The protobuf wire format used by tiles is small enough to write by hand, so no
+extra dependency is needed: a tile is a list of layers, each layer a list of
+features with tag-encoded properties and command-encoded integer geometry in
+tile coordinates (origin top-left, y pointing down).
+"""
+import math
+import struct
+import numpy as np
+import shapely
+
+EXTENT = 4096
+# Geometry is clipped slightly outside the tile so that strokes at tile edges join up.
+BUFFER = 64
+MAX_ZOOM = 22
+
+_POLYGON, _POINT = 3, 1
+
+
+# --- Protobuf primitives ---
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _field(number, wire_type):
+    return _varint(number << 3 | wire_type)
+
+
+def _uint(number, value):
+    return _field(number, 0) + _varint(value)
+
+
+def _message(number, data):
+    return _field(number, 2) + _varint(len(data)) + data
+
+
+def _packed(number, values):
+    return _message(number, b''.join(_varint(v) for v in values))
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return _uint(7, int(value))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        return _uint(5, value) if value >= 0 else _uint(6, _zigzag(value))
+    if isinstance(value, (float, np.floating)):
+        return _field(3, 1) + struct.pack('<d', float(value))
+    return _message(1, str(value).encode('utf-8'))
+
+
+# --- Projection ---
+
+def tile_bounds(z, x, y, buffer=0.0):
+    """(min_lon, min_lat, max_lon, max_lat) of a tile, grown by `buffer` tile widths."""
+    n = 2 ** z
+
+    def lon(tx):
+        return tx / n * 360.0 - 180.0
+
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return lon(x - buffer), lat(y + 1 + buffer), lon(x + 1 + buffer), lat(y - buffer)
+
+
+def project(longitudes, latitudes, z, x, y):
+    """Web Mercator projection of lon/lat arrays into (float) tile coordinates."""
+    n = 2 ** z
+    lat = np.radians(np.clip(latitudes, -85.0511, 85.0511))
+    px = ((np.asarray(longitudes) + 180.0) / 360.0 * n - x) * EXTENT
+    py = ((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2 * n - y) * EXTENT
+    return px, py
+
+
+def clip_to_tile(geometries, z, x, y):
+    """Projects lon/lat geometries into tile coordinates and clips them to the buffered tile."""
+    def to_tile(coords):
+        return np.column_stack(project(coords[:, 0], coords[:, 1], z, x, y))
+
+    projected = shapely.transform(geometries, to_tile)
+    return shapely.clip_by_rect(projected, -BUFFER, -BUFFER, EXTENT + BUFFER, EXTENT + BUFFER)
+
+
+# --- Geometry commands ---
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def _ring_points(ring):
+    """Integer ring vertices without the closing point or repeated vertices."""
+    coords = np.round(shapely.get_coordinates(ring)[:-1]).astype(np.int64)
+    if len(coords):
+        keep = np.ones(len(coords), dtype=bool)
+        keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+        coords = coords[keep]
+        if len(coords) > 1 and (coords[0] == coords[-1]).all():
+            coords = coords[:-1]
+    return coords
+
+
+def _signed_area(points):
+    x, y = points[:, 0], points[:, 1]
+    return float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)) / 2
+
+
+def polygon_commands(geometry):
+    """
+    Command stream for a (Multi)Polygon already in tile coordinates. Exterior rings
+    get positive area (clockwise on screen) and holes negative, as the spec requires;
+    rings that collapse when snapped to the integer grid are dropped.
+    """
+    commands = []
+    cursor = (0, 0)
+    for polygon in shapely.get_parts(geometry):
+        if shapely.get_type_id(polygon) != 3:
+            continue
+        rings = [polygon.exterior, *polygon.interiors]
+        for r, ring in enumerate(rings):
+            points = _ring_points(ring)
+            if len(points) < 3:
+                if r == 0:
+                    break  # without an exterior its holes mean nothing
+                continue
+            area = _signed_area(points)
+            if area == 0:
+                if r == 0:
+                    break
+                continue
+            if (area > 0) != (r == 0):
+                points = points[::-1]
+            dx, dy = points[0][0] - cursor[0], points[0][1] - cursor[1]
+            commands += [_command(1, 1), _zigzag(int(dx)), _zigzag(int(dy))]
+            deltas = np.diff(points, axis=0)
+            commands.append(_command(2, len(deltas)))
+            for ddx, ddy in deltas.tolist():
+                commands += [_zigzag(ddx), _zigzag(ddy)]
+            commands.append(_command(7, 1))
+            cursor = (int(points[-1][0]), int(points[-1][1]))
+    return commands
+
+
+def point_commands(px, py):
+    return [_command(1, 1), _zigzag(int(round(px))), _zigzag(int(round(py)))]
+
+
+# --- Tile assembly ---
+
+class LayerBuilder:
+    """Collects features for one tile layer, interning property keys and values."""
+
+    def __init__(self, name):
+        self.name = name
+        self.keys = {}
+        self.values = {}
+        self.features = []
+
+    def _tags(self, properties):
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(self.keys.setdefault(key, len(self.keys)))
+            # Type is part of the key so that 1, 1.0 and True stay distinct values.
+            tags.append(self.values.setdefault((type(value).__name__, value), len(self.values)))
+        return tags
+
+    def add(self, geometry_type, commands, properties, feature_id=None):
+        if not commands:
+            return
+        feature = b''
+        if feature_id is not None:
+            feature += _uint(1, feature_id)
+        feature += _packed(2, self._tags(properties)) + _uint(3, geometry_type) + _packed(4, commands)
+        self.features.append(feature)
+
+    def add_polygon(self, geometry, properties, feature_id=None):
+        self.add(_POLYGON, polygon_commands(geometry), properties, feature_id)
+
+    def add_point(self, px, py, properties, feature_id=None):
+        self.add(_POINT, point_commands(px, py), properties, feature_id)
+
+    def encode(self):
+        if not self.features:
+            return b''
+        layer = _uint(15, 2) + _message(1, self.name.encode('utf-8'))
+        layer += b''.join(_message(2, feature) for feature in self.features)
+        layer += b''.join(_message(3, key.encode('utf-8')) for key in self.keys)
+        layer += b''.join(_message(4, _value(value)) for _, value in self.values)
+        layer += _uint(5, EXTENT)
+        return _message(3, layer)
+
+
+def encode_tile(layers):
+    """Serializes LayerBuilders into tile bytes; empty layers are left out."""
+    return b''.join(layer.encode() for layer in layers)
+
+
+# --- Ward / post tiles ---
+
+# Points beyond this many in one tile are left out; zoom in to see them.
+MAX_TILE_POINTS = 20000
+
+
+def ward_tile(layer, query, z, x, y, with_points=False):
+    """
+    Encodes the areas of a boundary layer touching tile z/x/y (in a tile layer named
+    after it), simplified to about one pixel at z and
+    carrying their statistics for the posts in `query`, plus (optionally) a
+    'posts' layer with the individual posts inside the tile.
+    """
+    from .models import Post
+    from .queries import area_stats
+
+    bounds = tile_bounds(z, x, y, buffer=BUFFER / EXTENT)
+    candidates = np.sort(layer.index.tree.query(shapely.box(*bounds)))
+
+    wards = LayerBuilder(layer.name)
+    if len(candidates):
+        geometries = layer.levels[layer.tolerance_for(zoom=z)][candidates]
+        clipped = clip_to_tile(geometries, z, x, y)
+        names = [layer.names[i] for i in candidates]
+        stats = {row['ward_name']: row for row in area_stats(layer, query, names)}
+        for ward_id, name, geometry in zip(candidates.tolist(), names, clipped):
+            if shapely.is_empty(geometry):
+                continue
+            row = stats.get(name, {})
+            properties = {'ward_id': ward_id, 'ward_name': name, 'post_count': row.get('post_count', 0),
+                          'dominant_emotion': row.get('dominant_emotion')}
+            properties.update(row.get('emotions', {}))
+            wards.add_polygon(geometry, properties, feature_id=ward_id)
+
+    posts = LayerBuilder('posts')
+    if with_points:
+        min_lon, min_lat, max_lon, max_lat = bounds
+        rows = (query.filter(Post.longitude.between(min_lon, max_lon), Post.latitude.between(min_lat, max_lat))
+                     .with_entities(Post.id, Post.longitude, Post.latitude, Post.emotion)
+                     .order_by(Post.id)
+                     .limit(MAX_TILE_POINTS)
+                     .all())
+        if rows:
+            ids, lons, lats, emotions = zip(*rows)
+            px, py = project(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float), z, x, y)
+            for post_id, tx, ty, emotion in zip(ids, px.tolist(), py.tolist(), emotions):
+                posts.add_point(tx, ty, {'emotion': emotion}, feature_id=post_id)
+
+    return encode_tile([wards, posts])
@@ -0,0 +1,328 @@
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, func, or_
+from . import db
+from .geo import WARD_LAYER, get_ward_layer
+from .grid import GEOHASH_PRECISION, geohash_bounds
+from .models import Post
+from .stats import count_matrix, distributions, encode_categories
+
+POST_COLUMNS = ('id', 'timestamp', 'text', 'latitude', 'longitude', 'city', 'ward', 'constituency', 'emotion')
+
+# Query-string filters shared by every endpoint that reads posts. 'All' means no filter,
+# matching the values the dashboard's select boxes send.
+EQUALITY_FILTERS = ('emotion', 'city', 'ward', 'constituency')
+
+
+# Zone of the naive Post.timestamp values (posts are recorded in Hyderabad local time).
+STORAGE_TIMEZONE = 'Asia/Kolkata'
+
+
+class InvalidFilter(ValueError):
+    """A malformed filter parameter; routes answer it with 400."""
+
+
+def filter_posts(query, args):
+    for name in EQUALITY_FILTERS:
+        value = args.get(name)
+        if value and value != 'All':
+            query = query.filter(getattr(Post, name) == value)
+    search = args.get('q')
+    if search:
+        # A literal substring match, like the dashboard's own filtering: LIKE wildcards are escaped.
+        literal = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(Post.text.ilike(f'%{literal}%', escape='\\'))
+    # Timestamps are stored as 'YYYY-MM-DD HH:MM:SS' strings, so range checks are string comparisons
+    # against the bounds rewritten in that form.
+    if args.get('start'):
+        query = query.filter(Post.timestamp >= parse_timestamp(args['start'], 'start'))
+    if args.get('end'):
+        query = query.filter(Post.timestamp < parse_timestamp(args['end'], 'end'))
+    # Viewport filter; a range scan on ix_post_latitude_longitude with the longitude checked in the index.
+    if args.get('bbox'):
+        min_lon, min_lat, max_lon, max_lat = parse_bbox(args['bbox'])
+        query = query.filter(Post.latitude.between(min_lat, max_lat), Post.longitude.between(min_lon, max_lon))
+    return query
+
+
+def parse_timestamp(value, name):
+    """
+    A start / end bound in any form pandas parses (e.g. ISO 8601 with a 'T'),
+    as the stored 'YYYY-MM-DD HH:MM:SS' text. Stored timestamps are naive local
+    time in STORAGE_TIMEZONE (Asia/Kolkata), so bounds with an offset are converted
+    to it and bounds without one are taken as already in it.
+    """
+    try:
+        timestamp = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        timestamp = pd.NaT
+    if pd.isna(timestamp):
+        raise InvalidFilter(f'{name} must be a date or date-time, e.g. 2025-07-31 or 2025-07-31T08:30:00')
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(STORAGE_TIMEZONE).tz_localize(None)
+    return timestamp.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_bbox(value):
+    """'min_lon,min_lat,max_lon,max_lat' -> tuple of floats; ValueError when malformed."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        raise InvalidFilter('bbox must be min_lon,min_lat,max_lon,max_lat') from None
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise InvalidFilter('bbox must be min_lon,min_lat,max_lon,max_lat within -180..180 / -90..90')
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def post_columns(query):
+    """Runs a Post query and returns its rows as a dict of columns (no ORM objects)."""
+    rows = query.with_entities(*(getattr(Post, name) for name in POST_COLUMNS)).all()
+    if not rows:
+        return {name: [] for name in POST_COLUMNS}
+    return {name: list(values) for name, values in zip(POST_COLUMNS, zip(*rows))}
+
+
+def column_rows(columns):
+    """Turns a dict of columns back into a list of row dicts."""
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def parse_cursor(value):
+    """
+    A changes cursor: '<seq>' (everything up to and including data version seq)
+    or '<seq>:<id>' (a write split across pages: its rows up to post id). Returns
+    (seq, id) with id None for a whole write; InvalidFilter when malformed.
+    """
+    try:
+        seq, _, post_id = str(value).partition(':')
+        return int(seq), int(post_id) if post_id else None
+    except ValueError:
+        raise InvalidFilter("cursor must be '<data version>' or '<data version>:<post id>'") from None
+
+
+def format_cursor(cursor):
+    seq, post_id = cursor
+    return str(seq) if post_id is None else f'{seq}:{post_id}'
+
+
+def post_changes(query, since, version, limit):
+    """
+    At most `limit` posts inserted or changed after the `since` cursor (see
+    parse_cursor) and up to data version `version`, ordered by (change_seq, id).
+    A page may end inside a write (a seed, a boundary reassignment), in which case
+    the returned cursor carries the last post id. Returns (columns, cursor, has_more).
+    """
+    seq, last_id = since
+    after = Post.change_seq > seq if last_id is None else or_(
+        Post.change_seq > seq, and_(Post.change_seq == seq, Post.id > last_id))
+    changed = query.filter(after, Post.change_seq <= version)
+    seq_ids = changed.with_entities(Post.change_seq, Post.id).order_by(Post.change_seq, Post.id).limit(limit + 1).all()
+    if len(seq_ids) <= limit:
+        cursor, has_more = (version, None), False
+    else:
+        page_seq, page_id = seq_ids[limit - 1]
+        # A page that ends exactly at the end of a write gets a plain data-version cursor.
+        cursor, has_more = (page_seq, None if seq_ids[limit][0] != page_seq else page_id), True
+    page_seq, page_id = cursor
+    upto = Post.change_seq <= page_seq if page_id is None else or_(
+        Post.change_seq < page_seq, and_(Post.change_seq == page_seq, Post.id <= page_id))
+    columns = post_columns(changed.filter(upto).order_by(Post.change_seq, Post.id))
+    return columns, cursor, has_more
+
+
+def _grouped_counts(query, column):
+    rows = query.with_entities(column, func.count(Post.id)).group_by(column).order_by(func.count(Post.id).desc()).all()
+    return {key: count for key, count in rows if key is not None}
+
+
+def ward_emotion_counts(query):
+    """{ward: {emotion: count}} for posts with an assigned ward, grouped in the database."""
+    rows = (query.filter(Post.ward.isnot(None))
+                 .with_entities(Post.ward, Post.emotion, func.count(Post.id))
+                 .group_by(Post.ward, Post.emotion)
+                 .all())
+    counts = {}
+    for ward, emotion, count in rows:
+        counts.setdefault(ward, {})[emotion] = count
+    return counts
+
+
+def ward_stats(query):
+    """
+    Per-ward post count, dominant emotion, emotion counts and shares and the margin
+    of dominance (no geometry). Counts are grouped in the database.
+    """
+    counts = ward_emotion_counts(query)
+    wards = sorted(counts)
+    emotions = sorted({emotion for by_emotion in counts.values() for emotion in by_emotion if emotion is not None})
+    emotion_index = {emotion: e for e, emotion in enumerate(emotions)}
+    matrix = np.zeros((len(wards), len(emotions)), dtype=np.int64)
+    for w, ward in enumerate(wards):
+        for emotion, count in counts[ward].items():
+            if emotion in emotion_index:
+                matrix[w, emotion_index[emotion]] = count
+    ids = get_ward_layer().ids
+    return [
+        {'ward_id': ids.get(wards[w]), 'ward_name': wards[w], **stats}
+        for w, stats in distributions(matrix, emotions)
+    ]
+
+
+def area_stats(layer, query, names=None):
+    """
+    ward_stats for any boundary layer (ward_id / ward_name then refer to its areas),
+    optionally limited to the named areas. Wards use the stored Post.ward; other
+    layers locate the posts' coordinates in the layer.
+    """
+    if layer.name == WARD_LAYER:
+        return ward_stats(query if names is None else query.filter(Post.ward.in_(names)))
+    rows = (query.filter(Post.latitude.isnot(None), Post.longitude.isnot(None))
+                 .with_entities(Post.longitude, Post.latitude, Post.emotion)
+                 .all())
+    if not rows:
+        return []
+    longitudes, latitudes, emotion_values = zip(*rows)
+    area_idx = layer.locate(longitudes, latitudes)
+    if names is not None:
+        wanted = np.zeros(len(layer), dtype=bool)
+        wanted[[layer.ids[name] for name in names if name in layer.ids]] = True
+        area_idx = np.where((area_idx >= 0) & wanted[area_idx], area_idx, -1)
+    emotion_idx, emotions = encode_categories(emotion_values)
+    counts = count_matrix(area_idx, emotion_idx, len(layer), len(emotions))
+    results = [
+        {'ward_id': area_id, 'ward_name': layer.names[area_id], **stats}
+        for area_id, stats in distributions(counts, emotions)
+    ]
+    results.sort(key=lambda row: row['ward_name'])
+    return results
+
+
+def grid_stats(query, precision):
+    """
+    Post count, dominant emotion and emotion counts per geohash cell of `precision`
+    characters, grouped in the database on a prefix of the stored geohash.
+    """
+    if not 1 <= precision <= GEOHASH_PRECISION:
+        raise ValueError(f'precision must be between 1 and {GEOHASH_PRECISION}')
+    cell = func.substr(Post.geohash, 1, precision)
+    rows = (query.filter(Post.geohash.isnot(None))
+                 .with_entities(cell, Post.emotion, func.count(Post.id))
+                 .group_by(cell, Post.emotion)
+                 .all())
+    counts = {}
+    for geohash, emotion, count in rows:
+        counts.setdefault(geohash, {})[emotion] = count
+    cells = sorted(counts)
+    return [
+        {
+            'cell': geohash,
+            'bounds': bounds,
+            'dominant_emotion': max(counts[geohash], key=counts[geohash].get),
+            'post_count': sum(counts[geohash].values()),
+            'emotions': counts[geohash],
+        }
+        for geohash, bounds in zip(cells, geohash_bounds(cells).tolist())
+    ]
+
+
+def post_summary(query):
+    """Counts per emotion, city, ward and constituency, computed with GROUP BY in the database."""
+    return {
+        'total': query.with_entities(func.count(Post.id)).scalar(),
+        'emotions': _grouped_counts(query, Post.emotion),
+        'cities': _grouped_counts(query, Post.city),
+        'wards': _grouped_counts(query, Post.ward),
+        'constituencies': _grouped_counts(query, Post.constituency),
+    }
+
+
+def post_facets(query):
+    """The distinct values available for each filter, for populating select boxes."""
+    return {
+        'emotions': sorted(_grouped_counts(query, Post.emotion)),
+        'cities': sorted(_grouped_counts(query, Post.city)),
+        'wards': sorted(_grouped_counts(query, Post.ward)),
+        'constituencies': sorted(_grouped_counts(query, Post.constituency)),
+    }
+
+
+def post_page(query, limit, offset=0):
+    columns = post_columns(query.order_by(Post.id).limit(limit).offset(offset))
+    return {'total': query.with_entities(func.count(Post.id)).scalar(), 'posts': column_rows(columns)}
+
+
+@contextmanager
+def read_snapshot():
+    """
+    Runs the enclosed queries inside one read transaction so they all observe the
+    same state of the database, then ends it. pysqlite does not begin a transaction
+    for SELECTs on its own, so on SQLite one is opened explicitly.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN')
+    try:
+        yield
+    finally:
+        db.session.rollback()
+
+
+# Per interval: the SQLite expression truncating a timestamp to its bucket start, the
+# label format that expression produces, the pandas frequency used to zero-fill gaps
+# and the same truncation applied in Python to a requested start. Weeks start on Monday.
+TIMESERIES_INTERVALS = {
+    'hour': (lambda ts: func.strftime('%Y-%m-%d %H:00:00', ts), '%Y-%m-%d %H:%M:%S', 'h',
+             lambda t: t.floor('h')),
+    'day': (lambda ts: func.date(ts), '%Y-%m-%d', 'D',
+            lambda t: t.normalize()),
+    'week': (lambda ts: func.date(ts, 'weekday 0', '-6 days'), '%Y-%m-%d', 'W-MON',
+             lambda t: t.normalize() - pd.Timedelta(days=t.weekday())),
+}
+MAX_TIMESERIES_BUCKETS = 10000
+
+
+def emotion_timeseries(query, interval, start=None, end=None):
+    """
+    Post counts per emotion per time bucket, grouped in SQL and returned as dense,
+    zero-filled series aligned on a shared list of bucket start times.
+    """
+    truncate, label_format, freq, floor = TIMESERIES_INTERVALS[interval]
+    bucket = truncate(Post.timestamp)
+    rows = (query.filter(Post.timestamp.isnot(None))
+                 .with_entities(bucket, Post.emotion, func.count(Post.id))
+                 .group_by(bucket, Post.emotion)
+                 .all())
+    rows = [row for row in rows if row[0] is not None]
+
+    if start:
+        first = floor(pd.Timestamp(parse_timestamp(start, 'start')))
+    elif rows:
+        first = pd.Timestamp(min(row[0] for row in rows))
+    else:
+        first = None
+    if first is None or not (end or rows):
+        buckets = pd.DatetimeIndex([])
+    elif end:
+        buckets = pd.date_range(first, pd.Timestamp(parse_timestamp(end, 'end')), freq=freq, inclusive='left')
+    else:
+        buckets = pd.date_range(first, pd.Timestamp(max(row[0] for row in rows)), freq=freq)
+    if len(buckets) > MAX_TIMESERIES_BUCKETS:
+        raise ValueError(f'Requested range spans more than {MAX_TIMESERIES_BUCKETS} {interval} buckets')
+
+    labels = [b.strftime(label_format) for b in buckets]
+    position = {label: i for i, label in enumerate(labels)}
+    emotions = sorted({row[1] for row in rows if row[1] is not None})
+    emotion_index = {emotion: i for i, emotion in enumerate(emotions)}
+    counts = np.zeros((len(emotions), len(labels)), dtype=np.int64)
+    for label, emotion, count in rows:
+        if emotion in emotion_index and label in position:
+            counts[emotion_index[emotion], position[label]] = count
+
+    return {
+        'interval': interval,
+        'buckets': labels,
+        'series': {emotion: counts[i] for emotion, i in emotion_index.items()},
+        'total': counts.sum(axis=0),
+    }
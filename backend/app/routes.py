@@ -1,29 +1,59 @@
-from flask import Blueprint, jsonify, request
-from .models import Post, User
+import os
+from flask import Blueprint, Response, current_app, g, jsonify, request
+from .models import Post, User, current_data_version
+from .batch import MAX_SUBQUERIES, run_batch
+from .clusters import ClusterIndex
 from . import db
 from flask_login import login_user, logout_user, current_user
-import os
-import geopandas as gpd
-from shapely.geometry import Point
-import pandas as pd
+from functools import wraps
+from .caching import app_cache, cached_response, conditional
+from .encoders import columnar_response, negotiated
+from .geo import WARD_LAYER, UnknownLayer, boundaries, get_boundary_layer
+from .live import SubscriberLimitReached, event_stream, get_publisher
+from .mvt import MAX_ZOOM, ward_tile
+from .stats import count_matrix, distributions, encode_categories
+from .queries import (TIMESERIES_INTERVALS, InvalidFilter, area_stats, column_rows, emotion_timeseries, filter_posts,
+                      format_cursor, grid_stats, parse_bbox, parse_cursor, post_changes, post_columns, post_summary, read_snapshot)
 
 bp = Blueprint('main', __name__)
 
-wards_gdf = None
-def load_wards_geojson():
-    global wards_gdf
-    if wards_gdf is None:
-        # --- THIS IS THE CORRECTED FILE PATH ---
-        # It now correctly navigates up one level from /app to /backend
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        geojson_path = os.path.join(current_dir, '..', 'data', 'ghmc-wards.geojson')
-        
-        if not os.path.exists(geojson_path):
-            raise FileNotFoundError(f"GeoJSON file not found at the specified path: {geojson_path}")
-            
-        wards_gdf = gpd.read_file(geojson_path)
-    return wards_gdf
-# -----------------------------------------
+
+def auth_required(view):
+    # Checked ahead of any caching decorator so validators never leak to anonymous clients.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'message': 'Authentication required'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@bp.errorhandler(InvalidFilter)
+def invalid_filter(e):
+    return jsonify({'message': str(e)}), 400
+
+@bp.errorhandler(UnknownLayer)
+def unknown_layer(e):
+    return jsonify({'message': str(e)}), 404
+
+def requested_layer():
+    # Boundary layer picked by the layer= parameter; GHMC wards unless given. Kept for the
+    # rest of the request so a concurrent hot reload cannot swap it between ETag and body.
+    if 'layer' not in g:
+        g.layer = get_boundary_layer(request.args.get('layer', WARD_LAYER))
+    return g.layer
+
+def layer_dependent(view):
+    """
+    For views whose output depends on the boundary layer: records the requested
+    layer's version in g.layer_version, which caching.conditional puts into the
+    ETag. Workers pick up a changed boundary file at slightly different times, so
+    the data version alone does not tell their answers apart. Goes outside @conditional.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.layer_version = requested_layer().version
+        return view(*args, **kwargs)
+    return wrapper
 
 # --- Authentication and other routes remain the same ---
 @bp.route('/api/v1/login', methods=['POST'])
@@ -48,51 +78,256 @@ def status():
         return jsonify({'logged_in': False})
 
 @bp.route('/api/v1/analytics', methods=['GET'])
+@auth_required
+@negotiated
+@conditional
 def analytics():
-    if not current_user.is_authenticated:
-        return jsonify({'message': 'Authentication required'}), 401
-    posts = Post.query.all()
-    return jsonify([post.to_dict() for post in posts])
+    # JSON clients get row objects; Arrow / msgpack clients get dictionary-encoded columns.
+    return columnar_response(post_columns(filter_posts(Post.query, request.args)))
+
+@bp.route('/api/v1/analytics/summary', methods=['GET'])
+@auth_required
+@conditional
+@cached_response
+def analytics_summary():
+    # Same filters as /api/v1/analytics, but only the counts leave the database.
+    return jsonify(post_summary(filter_posts(Post.query, request.args)))
+
+@bp.route('/api/v1/analytics/timeseries', methods=['GET'])
+@auth_required
+@conditional
+@cached_response
+def analytics_timeseries():
+    interval = request.args.get('interval', 'day')
+    if interval not in TIMESERIES_INTERVALS:
+        return jsonify({'message': f"interval must be one of {', '.join(TIMESERIES_INTERVALS)}"}), 400
+    try:
+        series = emotion_timeseries(filter_posts(Post.query, request.args), interval,
+                                    request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(series)
+
+@bp.route('/api/v1/analytics/grid', methods=['GET'])
+@auth_required
+@conditional
+@cached_response
+def analytics_grid():
+    # Geohash cells: precision 5 is about 5 km across, 6 about 1 km, 7 about 150 m.
+    precision = request.args.get('precision', 6, type=int)
+    try:
+        cells = grid_stats(filter_posts(Post.query, request.args), precision)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify({'precision': precision, 'cells': cells})
+
+@bp.route('/api/v1/analytics/changes', methods=['GET'])
+@auth_required
+@conditional
+def analytics_changes():
+    since = parse_cursor(request.args.get('since', '0'))
+    try:
+        limit = min(int(request.args.get('limit', 5000)), 50000)
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+    if limit < 1:
+        return jsonify({'message': 'limit must be positive'}), 400
+
+    version, _ = current_data_version()
+    columns, cursor, has_more = post_changes(filter_posts(Post.query, request.args), since, version, limit)
+    return jsonify({'cursor': format_cursor(cursor), 'has_more': has_more, 'posts': column_rows(columns)})
+
+@bp.route('/api/v1/batch', methods=['POST'])
+@auth_required
+def batch():
+    body = request.get_json(silent=True)
+    queries = body.get('queries') if isinstance(body, dict) else None
+    if not isinstance(queries, dict) or not queries:
+        return jsonify({'message': "Expected a JSON body with a non-empty 'queries' object"}), 400
+    if len(queries) > MAX_SUBQUERIES:
+        return jsonify({'message': f'At most {MAX_SUBQUERIES} sub-queries per batch'}), 400
+
+    # One session and one read transaction: every sub-query sees the same data version.
+    with read_snapshot():
+        version, _ = current_data_version()
+        results = run_batch(queries)
+    return jsonify({'data_version': version, 'results': results})
+
+@bp.route('/api/v1/stream', methods=['GET'])
+@auth_required
+def live_stream():
+    # EventSource cannot set headers on the first connection, so a query parameter is accepted too.
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    last_event_id = parse_cursor(last_event_id) if last_event_id else None
+
+    # Subscribed before the response starts so a full worker can still answer with a status code.
+    app = current_app._get_current_object()
+    publisher = get_publisher(app)
+    try:
+        subscription = publisher.subscribe()
+    except SubscriberLimitReached as e:
+        response = jsonify({'message': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '10'
+        return response
+
+    response = Response(event_stream(app, subscription, last_event_id), mimetype='text/event-stream')
+    # Also when the stream is closed before its generator ever ran.
+    response.call_on_close(lambda: publisher.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/api/v1/cache/stats', methods=['GET'])
+@auth_required
+def cache_stats():
+    # Counters are per worker; pid tells the workers apart.
+    return jsonify({'pid': os.getpid(), **current_app.extensions['response_cache'].report()})
+
+@bp.route('/api/v1/boundaries', methods=['GET'])
+def boundary_layers():
+    available, loaded = boundaries.available(), boundaries.loaded()
+    return jsonify({'layers': [
+        {'name': name, 'available': name in available, 'loaded': name in loaded} for name in boundaries.layers
+    ]})
+
+GEOMETRY_FORMATS = {'geojson': 'application/geo+json', 'topojson': 'application/json'}
+
+@bp.route('/api/v1/wards/geometry', methods=['GET'])
+def ward_geometry():
+    """
+    Ward (or other `layer`) boundaries only, as GeoJSON or TopoJSON, at the
+    simplification level for `zoom` / `tolerance`. The body depends only on the boundary file, so it is
+    public; requests carrying the current `v` (geometry_version from /wards/stats)
+    may be cached forever.
+    """
+    fmt = request.args.get('format', 'geojson')
+    if fmt not in GEOMETRY_FORMATS:
+        return jsonify({'message': f"format must be one of {', '.join(GEOMETRY_FORMATS)}"}), 400
+    layer = requested_layer()
+    tolerance = layer.tolerance_for(request.args.get('zoom', type=int), request.args.get('tolerance', type=float))
+    etag = f'{layer.name}-{layer.version}-{tolerance}-{fmt}'
+    # The compression hook gives each encoded body its own strong tag (<etag>-gzip, <etag>-br).
+    matched = next((tag for tag in (etag, f'{etag}-gzip', f'{etag}-br') if request.if_none_match.contains(tag)), None)
+
+    if matched:
+        response = current_app.response_class(status=304)
+        etag = matched
+    else:
+        body = layer.encoded.get((fmt, tolerance))
+        if body is None:
+            data = layer.topology(tolerance) if fmt == 'topojson' else layer.feature_collection(tolerance)
+            body = layer.encoded.setdefault((fmt, tolerance), current_app.json.dumps(data).encode('utf-8'))
+        response = current_app.response_class(body, mimetype=GEOMETRY_FORMATS[fmt])
+
+    response.set_etag(etag)
+    response.headers['X-Geometry-Version'] = layer.version
+    response.cache_control.public = True
+    if request.args.get('v') == layer.version:
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = 300
+    return response
+
+@bp.route('/api/v1/wards/stats', methods=['GET'])
+@auth_required
+@layer_dependent
+@conditional
+@cached_response
+def ward_statistics():
+    # Numbers only; join with /api/v1/wards/geometry (same layer) on ward_id.
+    layer = requested_layer()
+    return jsonify({
+        'layer': layer.name,
+        'geometry_version': layer.version,
+        'wards': area_stats(layer, filter_posts(Post.query, request.args)),
+    })
+
+MVT_MIMETYPE = 'application/vnd.mapbox-vector-tile'
+
+@bp.route('/api/v1/tiles/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+@auth_required
+@layer_dependent
+@conditional
+def vector_tile(z, x, y):
+    """
+    Mapbox Vector Tile with a 'wards' (or other `layer`) layer of clipped, simplified
+    boundaries and their stats and, with points=1, a 'posts' layer. Takes the usual post filters.
+    Encoded tiles are cached per (z, x, y, params, data version).
+    """
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({'message': 'Tile out of range'}), 404
+    layer = requested_layer()
+    version, _ = current_data_version()
+    params = tuple(sorted(request.args.items(multi=True)))
+    key = (z, x, y, params, version, layer.version)
+
+    tiles = app_cache('tiles', current_app.config.get('TILE_CACHE_SIZE', 1024))
+    body = tiles.get(key)
+    if body is None:
+        query = filter_posts(Post.query, request.args)
+        body = ward_tile(layer, query, z, x, y, with_points=request.args.get('points') == '1')
+        tiles.put(key, body)
+    return current_app.response_class(body, mimetype=MVT_MIMETYPE)
+
+@bp.route('/api/v1/clusters', methods=['GET'])
+@auth_required
+@conditional
+def marker_clusters():
+    """
+    Post markers clustered for the given viewport and zoom, each with its emotion
+    breakdown; above the clustering zoom range single posts come back with post_id.
+    The cluster hierarchy is built once per data version and set of post filters.
+    """
+    try:
+        bbox = parse_bbox(request.args.get('bbox', '-180,-90,180,90'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    zoom = request.args.get('zoom', 0, type=int)
+
+    version, _ = current_data_version()
+    params = tuple(sorted((k, v) for k, v in request.args.items(multi=True) if k not in ('bbox', 'zoom')))
+    indexes = app_cache('clusters', current_app.config.get('CLUSTER_CACHE_SIZE', 8))
+    index = indexes.get((version, params))
+    if index is None:
+        # The index covers the whole filtered set; bbox only selects what is returned from it.
+        columns = post_columns(filter_posts(Post.query, dict(params))
+                               .filter(Post.latitude.isnot(None), Post.longitude.isnot(None)))
+        index = ClusterIndex(columns['id'], columns['longitude'], columns['latitude'], columns['emotion'])
+        indexes.put((version, params), index)
+    return jsonify({'zoom': zoom, 'clusters': index.query(bbox, zoom)})
 
 @bp.route('/api/v1/analytics/granular', methods=['GET'])
+@auth_required
+@layer_dependent
+@conditional
+@cached_response
 def granular_analytics():
-    if not current_user.is_authenticated:
-        return jsonify({'message': 'Authentication required'}), 401
-    
+    # Optional zoom (web-map zoom level) or tolerance (degrees) picks a simplified geometry level.
+    zoom = request.args.get('zoom', type=int)
+    tolerance = request.args.get('tolerance', type=float)
+    layer = requested_layer()
     try:
-        wards = load_wards_geojson()
-        posts = Post.query.filter(Post.latitude.isnot(None), Post.longitude.isnot(None)).all()
-        if not posts:
+        geojson = layer.geojson_levels[layer.tolerance_for(zoom, tolerance)]
+        columns = post_columns(Post.query.filter(Post.latitude.isnot(None), Post.longitude.isnot(None)))
+        if not columns['id']:
             return jsonify([])
 
-        posts_df = pd.DataFrame([p.to_dict() for p in posts])
-        posts_df['longitude'] = pd.to_numeric(posts_df['longitude'])
-        posts_df['latitude'] = pd.to_numeric(posts_df['latitude'])
-        geometry = [Point(xy) for xy in zip(posts_df['longitude'], posts_df['latitude'])]
-        posts_gdf = gpd.GeoDataFrame(posts_df, geometry=geometry, crs="EPSG:4326")
-        
-        if wards.crs is None: wards.set_crs("EPSG:4326", inplace=True)
-        if posts_gdf.crs != wards.crs: posts_gdf.to_crs(wards.crs, inplace=True)
-
-        joined_gdf = gpd.sjoin(posts_gdf, wards, how="inner", predicate='within')
-
-        if joined_gdf.empty: return jsonify([])
-            
-        emotion_counts = joined_gdf.groupby(['name', 'emotion']).size().unstack(fill_value=0)
-        dominant_emotion = emotion_counts.idxmax(axis=1)
-        
-        results = []
-        for ward_name, emotion in dominant_emotion.items():
-            ward_data = wards[wards['name'] == ward_name]
-            results.append({
-                'ward_name': ward_name,
-                'dominant_emotion': emotion,
-                'post_count': int(emotion_counts.loc[ward_name].sum()),
-                'geometry': ward_data.geometry.__geo_interface__['features'][0]['geometry']
-            })
+        # Bulk point-in-polygon lookup; -1 marks posts outside every ward.
+        ward_idx = layer.locate(columns['longitude'], columns['latitude'])
+        emotion_idx, emotions = encode_categories(columns['emotion'])
+        counts = count_matrix(ward_idx, emotion_idx, len(layer), len(emotions))
+
+        # Geometry comes pre-serialized from the ward layer; only the stats are computed per request.
+        results = [
+            {'ward_id': ward_id, 'ward_name': layer.names[ward_id], **stats, 'geometry': geojson[ward_id]}
+            for ward_id, stats in distributions(counts, emotions)
+        ]
+        results.sort(key=lambda row: row['ward_name'])
         return jsonify(results)
     except Exception as e:
         print(f"Error in granular analytics: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({"error": "An error occurred during geo-analysis"}), 500
\ No newline at end of file
+        return jsonify({"error": "An error occurred during geo-analysis"}), 500
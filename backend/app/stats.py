@@ -0,0 +1,57 @@
+"""
+Vectorized per-area emotion statistics.
+
+Emotions are encoded as small integers so a whole areas x emotions count matrix
+is one np.bincount over area_idx * n_emotions + emotion_idx. Shares, dominant
+emotion and the margin of dominance are then plain array operations.
+"""
+import numpy as np
+import pandas as pd
+
+
+def encode_categories(values):
+    """(int64 codes, sorted categories) for a sequence of labels; missing labels get -1."""
+    codes, categories = pd.factorize(pd.Series(values, dtype=object), sort=True, use_na_sentinel=True)
+    return codes.astype(np.int64), list(categories)
+
+
+def count_matrix(row_idx, col_idx, n_rows, n_cols):
+    """n_rows x n_cols counts of (row, col) pairs; pairs with a negative index are skipped."""
+    row_idx = np.asarray(row_idx, dtype=np.int64)
+    col_idx = np.asarray(col_idx, dtype=np.int64)
+    keep = (row_idx >= 0) & (col_idx >= 0)
+    flat = row_idx[keep] * n_cols + col_idx[keep]
+    return np.bincount(flat, minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+
+
+def summarize(counts):
+    """
+    Per row of a count matrix: total, dominant column, shares and the margin of
+    dominance (top share minus runner-up share; 0 means a tie for first place).
+    """
+    totals = counts.sum(axis=1)
+    shares = counts / np.maximum(totals, 1)[:, None]
+    dominant = counts.argmax(axis=1)
+    if counts.shape[1] >= 2:
+        top_two = np.partition(shares, -2, axis=1)[:, -2:]
+        margin = top_two[:, 1] - top_two[:, 0]
+    else:
+        margin = (totals > 0).astype(float)
+    return totals, dominant, shares, margin
+
+
+def distributions(counts, emotions):
+    """
+    Yields (row, stats) for every row with at least one post, where stats holds the
+    dominant emotion, post count, full counts and shares, and the margin.
+    """
+    totals, dominant, shares, margin = summarize(counts)
+    for row in np.flatnonzero(totals).tolist():
+        present = np.flatnonzero(counts[row]).tolist()
+        yield row, {
+            'dominant_emotion': emotions[dominant[row]],
+            'post_count': int(totals[row]),
+            'emotions': {emotions[e]: int(counts[row, e]) for e in present},
+            'shares': {emotions[e]: round(float(shares[row, e]), 4) for e in present},
+            'margin': round(float(margin[row]), 4),
+        }
@@ -0,0 +1,128 @@
+"""
+Minimal TopoJSON encoder for polygon coverages such as ward boundaries.
+
+Borders shared by two wards are stored once as an arc referenced by both, and
+arcs are quantized and delta-encoded, so the result is much smaller than the
+equivalent GeoJSON. Only Polygon and MultiPolygon geometries are supported.
+"""
+
+QUANTIZATION = 100000
+
+
+def _rings(geometry):
+    """Yields (polygon_index, ring_index, coordinates) for every ring of a GeoJSON (Multi)Polygon."""
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    for p, polygon in enumerate(polygons):
+        for r, ring in enumerate(polygon):
+            yield p, r, ring
+
+
+def _quantize_ring(ring, translate, scale):
+    points = []
+    for x, y in ((c[0], c[1]) for c in ring):
+        point = (round((x - translate[0]) / scale[0]), round((y - translate[1]) / scale[1]))
+        if not points or points[-1] != point:
+            points.append(point)
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()  # rings are handled open; the closing point is implied
+    return points
+
+
+def _find_junctions(rings):
+    """
+    A point is a junction when it is visited with different neighbours in different
+    places, i.e. where one shared border ends and another begins.
+    """
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        n = len(ring)
+        for i, point in enumerate(ring):
+            pair = frozenset((ring[i - 1], ring[(i + 1) % n]))
+            seen = neighbours.setdefault(point, pair)
+            if seen != pair:
+                junctions.add(point)
+    return junctions
+
+
+def _canonical_loop(ring):
+    """Rotation- and direction-independent key for a ring without junctions."""
+    start = ring.index(min(ring))
+    forward = tuple(ring[start:] + ring[:start])
+    backward = tuple(reversed(forward[1:] + forward[:1]))
+    return min(forward, backward), forward == min(forward, backward)
+
+
+def encode(geometries, properties=None, object_name='collection', ids=None):
+    """
+    Encodes a list of GeoJSON (Multi)Polygon dicts as a TopoJSON Topology dict with
+    one GeometryCollection object. properties / ids are optional per-geometry lists.
+    """
+    xs = [c[0] for g in geometries for _, _, ring in _rings(g) for c in ring]
+    ys = [c[1] for g in geometries for _, _, ring in _rings(g) for c in ring]
+    if not xs:
+        return {'type': 'Topology', 'objects': {object_name: {'type': 'GeometryCollection', 'geometries': []}}, 'arcs': []}
+    translate = (min(xs), min(ys))
+    scale = ((max(xs) - translate[0]) / (QUANTIZATION - 1) or 1.0,
+             (max(ys) - translate[1]) / (QUANTIZATION - 1) or 1.0)
+
+    quantized = [[(p, r, _quantize_ring(ring, translate, scale)) for p, r, ring in _rings(g)] for g in geometries]
+    junctions = _find_junctions([ring for rings in quantized for _, _, ring in rings])
+
+    arcs = []
+    arc_index = {}
+
+    def arc_ref(points):
+        key = tuple(points)
+        if key in arc_index:
+            return arc_index[key]
+        reverse_key = tuple(reversed(points))
+        if reverse_key in arc_index:
+            return ~arc_index[reverse_key]
+        arc_index[key] = len(arcs)
+        arcs.append(points)
+        return arc_index[key]
+
+    encoded = []
+    for i, rings in enumerate(quantized):
+        polygons = {}
+        for p, r, ring in rings:
+            if len(ring) < 3:
+                continue
+            cuts = [k for k, point in enumerate(ring) if point in junctions]
+            if not cuts:
+                loop, forward = _canonical_loop(ring)
+                ref = arc_ref(list(loop) + [loop[0]])
+                refs = [ref if forward else ~ref]
+            else:
+                rotated = ring[cuts[0]:] + ring[:cuts[0]]
+                rotated.append(rotated[0])
+                offsets = [k - cuts[0] for k in cuts] + [len(ring)]
+                refs = [arc_ref(rotated[a:b + 1]) for a, b in zip(offsets, offsets[1:])]
+            polygons.setdefault(p, []).append(refs)
+        polygon_arcs = [polygons[p] for p in sorted(polygons)]
+        if geometries[i]['type'] == 'Polygon':
+            geometry = {'type': 'Polygon', 'arcs': polygon_arcs[0] if polygon_arcs else []}
+        else:
+            geometry = {'type': 'MultiPolygon', 'arcs': polygon_arcs}
+        if ids is not None:
+            geometry['id'] = ids[i]
+        if properties is not None:
+            geometry['properties'] = properties[i]
+        encoded.append(geometry)
+
+    delta_arcs = []
+    for points in arcs:
+        x0, y0 = 0, 0
+        delta = []
+        for x, y in points:
+            delta.append([x - x0, y - y0])
+            x0, y0 = x, y
+        delta_arcs.append(delta)
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': list(scale), 'translate': list(translate)},
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': encoded}},
+        'arcs': delta_arcs,
+    }
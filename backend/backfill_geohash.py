@@ -0,0 +1,21 @@
+"""
+Fills Post.geohash for posts that have coordinates but no geohash yet
+(e.g. rows ingested before the geohash column existed).
+"""
+from app import create_app, db
+from app.models import Post
+from app.grid import geohash_encode
+
+app = create_app()
+with app.app_context():
+    posts = Post.query.filter(
+        Post.geohash.is_(None), Post.latitude.isnot(None), Post.longitude.isnot(None)
+    ).all()
+    print(f"Computing geohashes for {len(posts)} posts...")
+
+    hashes = geohash_encode([p.latitude for p in posts], [p.longitude for p in posts])
+    for post, geohash in zip(posts, hashes):
+        post.geohash = geohash
+
+    db.session.commit()
+    print("Done.")
@@ -0,0 +1,24 @@
+"""
+Fills Post.ward for posts that have coordinates but no ward yet
+(e.g. rows ingested before the ward column existed).
+"""
+from app import create_app, db
+from app.models import Post
+from app.geo import assign_wards
+
+app = create_app()
+with app.app_context():
+    posts = Post.query.filter(
+        Post.ward.is_(None), Post.latitude.isnot(None), Post.longitude.isnot(None)
+    ).all()
+    print(f"Assigning wards to {len(posts)} posts...")
+
+    wards = assign_wards([p.longitude for p in posts], [p.latitude for p in posts])
+    assigned = 0
+    for post, ward in zip(posts, wards):
+        if ward is not None:
+            post.ward = ward
+            assigned += 1
+
+    db.session.commit()
+    print(f"Done. {assigned} posts fall inside a GHMC ward.")
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark for the API JSON providers.
+
+Serializes a synthetic /api/v1/analytics payload (list of post dicts) and a
+granular-style payload (numpy scalars from a pandas groupby) through both the
+stdlib-backed and the orjson-backed provider.
+
+Usage: python bench_json.py [n_posts]
+"""
+import sys
+import timeit
+import numpy as np
+from flask import Flask
+from app.json_provider import NumpyJSONProvider, OrjsonProvider, orjson
+
+EMOTIONS = ['Hope', 'Anger', 'Joy', 'Anxiety', 'Sadness', 'Disgust', 'Apathy']
+
+
+def make_posts(n):
+    rng = np.random.default_rng(42)
+    return [
+        {
+            'id': i,
+            'timestamp': f'2025-07-31 {i % 24:02d}:{i % 60:02d}:00',
+            'text': f'Sample post number {i} about roads, water and the new flyover.',
+            'latitude': 17.3 + float(rng.random()) * 0.3,
+            'longitude': 78.3 + float(rng.random()) * 0.3,
+            'city': 'Hyderabad',
+            'emotion': EMOTIONS[i % len(EMOTIONS)],
+        }
+        for i in range(n)
+    ]
+
+
+def make_ward_stats(n_wards):
+    counts = np.random.default_rng(7).integers(0, 50, size=(n_wards, len(EMOTIONS)))
+    return [
+        {
+            'ward_name': f'Ward {i}',
+            'dominant_emotion': EMOTIONS[int(row.argmax())],
+            'post_count': row.sum(),  # numpy.int64, no int() cast
+        }
+        for i, row in enumerate(counts)
+    ]
+
+
+def bench(provider_cls, payload, number):
+    app = Flask(__name__)
+    app.json = provider_cls(app)
+    with app.app_context():
+        run = lambda: app.json.response(payload)
+        return min(timeit.repeat(run, number=number, repeat=5)) / number
+
+
+def main():
+    n_posts = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    payloads = {
+        f'analytics ({n_posts} posts)': make_posts(n_posts),
+        'granular stats (150 wards)': make_ward_stats(150),
+    }
+    providers = [NumpyJSONProvider]
+    if orjson is not None:
+        providers.append(OrjsonProvider)
+    else:
+        print('orjson is not installed; only the stdlib provider is measured.')
+
+    for name, payload in payloads.items():
+        number = 5 if 'analytics' in name else 500
+        timings = {cls.__name__: bench(cls, payload, number) for cls in providers}
+        print(name)
+        for provider, seconds in timings.items():
+            print(f'  {provider:<20} {seconds * 1000:9.3f} ms')
+        if len(timings) == 2:
+            print(f"  speedup              {timings['NumpyJSONProvider'] / timings['OrjsonProvider']:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Precomputes derived boundary data into data/cache/ so workers can load it
+instead of recomputing it: for every available boundary layer, the
+preprocessed layer (WKB + metadata, see app.geo.save_layer_cache) and its
+lookup raster (see app.geo.LookupGrid). Files are keyed by the boundary
+file's hash, so re-run this after changing a GeoJSON; stale files are
+simply ignored.
+"""
+import time
+from app.geo import (BoundaryLayer, boundaries, build_lookup_grid, file_digest, layer_cache_path, load_boundary_geojson,
+                     load_layer_cache, lookup_grid_path, save_layer_cache)
+
+for name in boundaries.available():
+    path = boundaries.path(name)
+    version = file_digest(path)[:16]
+
+    start = time.perf_counter()
+    layer = BoundaryLayer.from_gdf(load_boundary_geojson(path), boundaries.layers[name][1], name=name, version=version)
+    from_geojson = time.perf_counter() - start
+    save_layer_cache(layer)
+    print(f"{name}: layer cache written to {layer_cache_path(name, version)}")
+
+    start = time.perf_counter()
+    grid = build_lookup_grid(layer)
+    rows, columns = grid.cells.shape
+    print(f"{name}: lookup grid {rows}x{columns} written to {lookup_grid_path(name, version)} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    load_layer_cache(name, version)
+    from_cache = time.perf_counter() - start
+    print(f"{name}: layer load {from_geojson * 1000:.0f} ms from GeoJSON, {from_cache * 1000:.1f} ms from cache")
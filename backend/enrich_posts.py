@@ -0,0 +1,61 @@
+"""
+Derives Post.city, Post.ward and Post.constituency from the coordinates of posts
+where they are missing, using the boundary layers' spatial index (see
+app.assignments.enrich_posts). Layers whose boundary file is not present are
+skipped.
+
+The work is committed in chunks and the last finished id is recorded in
+data/cache/enrich-posts.json, so an interrupted run resumes where it stopped.
+The record is ignored when the boundary files or options have changed since.
+
+    python enrich_posts.py              # fill missing values
+    python enrich_posts.py --overwrite  # also correct values that disagree with the boundaries
+    python enrich_posts.py --restart    # start from the first post again
+"""
+import argparse
+import json
+import os
+from app import create_app, db
+from app.assignments import REASSIGN_CHUNK_SIZE, enrich_posts, enrichment_layers
+from app.geo import CACHE_DIR
+
+CHECKPOINT_PATH = os.path.join(CACHE_DIR, 'enrich-posts.json')
+
+parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+parser.add_argument('--overwrite', action='store_true', help='replace existing values that differ from the derived ones')
+parser.add_argument('--restart', action='store_true', help='ignore the recorded progress')
+parser.add_argument('--chunk-size', type=int, default=REASSIGN_CHUNK_SIZE)
+args = parser.parse_args()
+
+
+def save_checkpoint(checkpoint):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f'{CHECKPOINT_PATH}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+app = create_app()
+with app.app_context():
+    layers = enrichment_layers()
+    if not layers:
+        raise SystemExit("No boundary files found in data/; nothing to derive.")
+    run = {'layers': {name: layer.version for name, layer in layers.items()}, 'overwrite': args.overwrite}
+
+    after_id = 0
+    if not args.restart and os.path.exists(CHECKPOINT_PATH):
+        with open(CHECKPOINT_PATH) as f:
+            checkpoint = json.load(f)
+        if {key: checkpoint.get(key) for key in run} == run:
+            after_id = checkpoint['after_id']
+            print(f"Resuming after post {after_id}.")
+
+    print(f"Deriving locations from: {', '.join(layers)}")
+    total = 0
+    for after_id, changed in enrich_posts(db.session, layers, after_id, args.chunk_size, args.overwrite):
+        total += changed
+        save_checkpoint({**run, 'after_id': after_id})
+        print(f"  up to post {after_id}: {changed} updated")
+
+    print(f"Done. {total} posts updated.")
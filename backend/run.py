@@ -1,6 +1,9 @@
 from app import create_app
+from app.geo import get_ward_layer
 
 app = create_app()
+# Preprocess the ward layer while the worker boots rather than on the first map request.
+get_ward_layer()
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
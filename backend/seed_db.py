@@ -2,6 +2,7 @@ import pandas as pd
 from app import create_app, db
 from app.models import Post
 from app.services import analyze_emotions
+from app.geo import assign_wards
 
 # Create an app context to interact with the database
 app = create_app()
@@ -28,7 +29,12 @@ with app.app_context():
         raise Exception("Stopping seed due to failed emotion analysis.")
     # -----------------------------------
 
-    print("Emotion analysis successful. Adding to database...")
+    print("Emotion analysis successful. Assigning GHMC wards...")
+    wards = assign_wards(df['longitude'], df['latitude'])
+    for record, ward in zip(enriched_records, wards):
+        record['ward'] = ward
+
+    print("Adding to database...")
     # Create Post objects and add them to the database
     for record in enriched_records:
         post = Post(
@@ -38,6 +44,7 @@ with app.app_context():
             latitude=record.get('latitude'),
             longitude=record.get('longitude'),
             city=record.get('city'),
+            ward=record.get('ward'),
             emotion=record.get('emotion')
         )
         db.session.add(post)
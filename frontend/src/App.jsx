@@ -3,6 +3,9 @@ import axios from 'axios';
 import Dashboard from './components/Dashboard';
 import LoginPage from './components/LoginPage'; // New import
 
+// The batch endpoint returns at most this many posts per page (MAX_PAGE_SIZE in app/batch.py).
+const PAGE_SIZE = 50000;
+
 function App() {
   const [isLoggedIn, setIsLoggedIn] = useState(false);
   const [loadingAuth, setLoadingAuth] = useState(true);
@@ -14,46 +17,57 @@ function App() {
   const [filters, setFilters] = useState({ emotion: 'All', city: 'All' });
   const [searchTerm, setSearchTerm] = useState('');
   const [filteredData, setFilteredData] = useState([]);
+  const [facets, setFacets] = useState({ emotions: [], cities: [] });
 
-  const checkAuthStatus = async () => {
+  // Cold start is a single round trip: the batch endpoint returns the posts and the
+  // filter facets together, and a 401 from it doubles as the auth status check.
+  const loadDashboard = async () => {
     const apiUrl = import.meta.env.VITE_API_BASE_URL || '';
     try {
       axios.defaults.withCredentials = true;
-      const response = await axios.get(`${apiUrl}/api/v1/status`);
-      setIsLoggedIn(response.data.logged_in);
-    } catch (err) {
-      setIsLoggedIn(false);
-    } finally {
-      setLoadingAuth(false);
-    }
-  };
+      const response = await axios.post(`${apiUrl}/api/v1/batch`, {
+        queries: {
+          posts: { type: 'posts', params: { limit: PAGE_SIZE } },
+          facets: { type: 'facets' }
+        }
+      });
+      const { posts, facets } = response.data.results;
+      // A failed sub-query comes back as { error } instead of failing the whole batch.
+      if (posts.error || facets.error) throw new Error(posts.error || facets.error);
 
-  const fetchData = async () => {
-    const apiUrl = import.meta.env.VITE_API_BASE_URL || '';
-    try {
-      const response = await axios.get(`${apiUrl}/api/v1/analytics`);
-      setAnalyticsData(response.data);
-      setFilteredData(response.data);
+      // Corpora larger than one page are fetched a page at a time.
+      let rows = posts.posts;
+      while (rows.length < posts.total) {
+        const page = await axios.post(`${apiUrl}/api/v1/batch`, {
+          queries: { posts: { type: 'posts', params: { limit: PAGE_SIZE, offset: rows.length } } }
+        });
+        const next = page.data.results.posts;
+        if (next.error) throw new Error(next.error);
+        if (!next.posts.length) break;
+        rows = rows.concat(next.posts);
+      }
+
+      setIsLoggedIn(true);
+      setAnalyticsData(rows);
+      setFilteredData(rows);
+      setFacets(facets);
     } catch (err) {
-      setError('Failed to fetch data. Please check your connection or login status.');
-      console.error(err);
+      if (err.response && err.response.status === 401) {
+        setIsLoggedIn(false);
+      } else {
+        setError('Failed to fetch data. Please check your connection or login status.');
+        console.error(err);
+      }
     } finally {
+      setLoadingAuth(false);
       setLoadingData(false);
     }
   };
 
-  // Check auth status on initial load
   useEffect(() => {
-    checkAuthStatus();
+    loadDashboard();
   }, []);
 
-  // Fetch main data only if logged in
-  useEffect(() => {
-    if (isLoggedIn) {
-      fetchData();
-    }
-  }, [isLoggedIn]);
-
   // Handle filtering logic
   useEffect(() => {
     let data = [...analyticsData];
@@ -74,6 +88,7 @@ function App() {
     return <LoginPage onLoginSuccess={() => {
       setIsLoggedIn(true);
       setLoadingData(true); // Show loading while fetching data
+      loadDashboard();
     }} />;
   }
 
@@ -96,7 +111,7 @@ function App() {
         <div className="max-w-7xl mx-auto py-6 sm:px-6 lg:px-8">
           <Dashboard 
             data={filteredData} 
-            allData={analyticsData}
+            facets={facets}
             filters={filters}
             setFilters={setFilters}
             searchTerm={searchTerm}
@@ -3,10 +3,10 @@ import LocationMap from './LocationMap';
 import DataTable from './DataTable';
 
 // This version is simplified to allow LocationMap to be self-sufficient.
-function Dashboard({ data, allData, filters, setFilters, searchTerm, setSearchTerm }) {
+function Dashboard({ data, facets, filters, setFilters, searchTerm, setSearchTerm }) {
 
-  const emotions = ['All', ...new Set(allData.map(item => item.emotion))];
-  const cities = ['All', ...new Set(allData.map(item => item.city))];
+  const emotions = ['All', ...facets.emotions];
+  const cities = ['All', ...facets.cities];
 
   const handleFilterChange = (e) => {
     setFilters(prevFilters => ({
@@ -69,8 +69,8 @@ function Dashboard({ data, allData, filters, setFilters, searchTerm, setSearchTe
         
         <div className="bg-white p-4 rounded-lg shadow-md">
           <h3 className="text-lg font-semibold text-gray-800 mb-4">Overall Emotion Distribution</h3>
-          {/* The chart still uses the main filtered data */}
-          <EmotionChart data={data} />
+          {/* The chart fetches its own server-side summary for the current filters */}
+          <EmotionChart filters={filters} searchTerm={searchTerm} />
         </div>
 
         <div className="lg:col-span-3 bg-white p-4 rounded-lg shadow-md">
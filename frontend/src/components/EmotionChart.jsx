@@ -1,13 +1,29 @@
+import { useState, useEffect } from 'react';
 import { Doughnut } from 'react-chartjs-2';
 import { Chart as ChartJS, ArcElement, Tooltip, Legend, Title } from 'chart.js';
+import axios from 'axios';
 
 ChartJS.register(ArcElement, Tooltip, Legend, Title);
 
-function EmotionChart({ data }) {
-  const emotionCounts = data.reduce((acc, item) => {
-    acc[item.emotion] = (acc[item.emotion] || 0) + 1;
-    return acc;
-  }, {});
+function EmotionChart({ filters, searchTerm }) {
+  const [emotionCounts, setEmotionCounts] = useState({});
+
+  // Counts are computed server-side; only the per-emotion totals are downloaded.
+  useEffect(() => {
+    const fetchSummary = async () => {
+      const apiUrl = import.meta.env.VITE_API_BASE_URL || '';
+      try {
+        const response = await axios.get(`${apiUrl}/api/v1/analytics/summary`, {
+          params: { ...filters, q: searchTerm || undefined }
+        });
+        setEmotionCounts(response.data.emotions);
+      } catch (err) {
+        console.error("Failed to fetch emotion summary:", err);
+      }
+    };
+
+    fetchSummary();
+  }, [filters, searchTerm]);
 
   const chartData = {
     labels: Object.keys(emotionCounts),
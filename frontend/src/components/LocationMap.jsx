@@ -26,25 +26,38 @@ function LocationMap() {
   const [error, setError] = useState(null);
 
   useEffect(() => {
-    const fetchGranularData = async () => {
+    const fetchWardData = async () => {
       const apiUrl = import.meta.env.VITE_API_BASE_URL || '';
       try {
         axios.defaults.withCredentials = true;
-        const response = await axios.get(`${apiUrl}/api/v1/analytics/granular`);
-        
-        if (response.data && response.data.length > 0) {
-            // Transform the API response into a valid GeoJSON FeatureCollection
+        // Numbers change with every post; boundaries only when the ward file does.
+        const statsResponse = await axios.get(`${apiUrl}/api/v1/wards/stats`);
+        const { geometry_version: version, wards } = statsResponse.data;
+
+        if (wards && wards.length > 0) {
+            // Passing the version makes the geometry response cacheable forever.
+            const geometryResponse = await axios.get(`${apiUrl}/api/v1/wards/geometry`, {
+              params: { zoom: ZOOM_LEVEL, v: version }
+            });
+            const statsById = new Map(wards.map(ward => [ward.ward_id, ward]));
+
+            // Join the boundary features with the per-ward statistics on ward_id
             const geoJsonFeatures = {
               type: "FeatureCollection",
-              features: response.data.map(ward => ({
-                type: "Feature",
-                geometry: ward.geometry,
-                properties: {
-                  name: ward.ward_name,
-                  emotion: ward.dominant_emotion,
-                  count: ward.post_count
-                }
-              }))
+              features: geometryResponse.data.features
+                .filter(feature => statsById.has(feature.id))
+                .map(feature => {
+                  const ward = statsById.get(feature.id);
+                  return {
+                    type: "Feature",
+                    geometry: feature.geometry,
+                    properties: {
+                      name: ward.ward_name,
+                      emotion: ward.dominant_emotion,
+                      count: ward.post_count
+                    }
+                  };
+                })
             };
             setGeoData(geoJsonFeatures);
         } else {
@@ -53,14 +66,14 @@ function LocationMap() {
         }
 
       } catch (err) {
-        console.error("Failed to fetch granular map data:", err);
+        console.error("Failed to fetch ward map data:", err);
         setError("Could not load granular map data.");
       } finally {
         setLoading(false);
       }
     };
 
-    fetchGranularData();
+    fetchWardData();
   }, []);
 
   // Function to determine the style of each ward polygon